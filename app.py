@@ -10,69 +10,115 @@ Fecha: Diciembre 2024
 
 import sys
 import os
+import argparse
 import platform
+import threading
 from typing import Optional
 
+# Directorio de la aplicación y de las imágenes de consulta (resueltos una vez)
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+_IMAGES_DIR = os.environ.get('RAG_IMAGES_DIR', os.path.join(_APP_DIR, "data", "images"))
+
 # Agregar el directorio raíz al path para imports
-sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, _APP_DIR)
 
 # Imports del proyecto
+# Los subsistemas pesados (scripts, search, rag) cargan sentence-transformers,
+# torch y CLIP al importarse; se importan dentro de cada opción para que el
+# menú arranque al instante. Los modelos quedan cargados (singletons) tras el
+# primer uso, así que las siguientes opciones no vuelven a pagar la carga.
 from config import verify_connection
-from scripts import (
-    create_all_collections,
-    create_all_indexes,
-    load_all_data,
-    verify_all_data
-)
-from search.vector_search import search_productos, search_resenas, search_by_image, hybrid_search
-from rag.groq_rag import rag_query_productos, rag_query_resenas, chat_interactive
+
+
+# Cargar los modelos de embeddings en segundo plano al abrir el menú (RAG_PRELOAD_MODELS=0 lo desactiva)
+_PRELOAD_MODELS = os.getenv('RAG_PRELOAD_MODELS', '1') != '0'
+
+# Respuestas afirmativas aceptadas en todos los prompts (s/n)
+_AFFIRM = frozenset({'s', 'si', 'sí', 'y', 'yes', 'yeah'})
+
+# Secuencia ANSI: borrar pantalla y mover el cursor al inicio
+_ANSI_CLEAR = '\x1b[2J\x1b[H'
+_IS_WINDOWS = platform.system() == 'Windows'
 
 
 def clear_screen():
     """Limpia la pantalla de la consola."""
-    os.system('cls' if platform.system() == 'Windows' else 'clear')
+    if _IS_WINDOWS:
+        # La consola clásica de Windows no siempre interpreta secuencias ANSI
+        os.system('cls')
+        return
+    sys.stdout.write(_ANSI_CLEAR)
+    sys.stdout.flush()
+
+
+# Encabezado y menú precomputados: se emiten con una sola escritura por iteración
+_HEADER = (
+    "\n" + "="*70 + "\n"
+    + " "*8 + "🚀 SISTEMA RAG MULTIMODAL - PRODUCTOS TECNOLÓGICOS\n"
+    + " "*10 + "MongoDB Atlas + Groq LLM + Embeddings Vectoriales\n"
+    + " "*15 + "Búsqueda por Texto 📝 + Imágenes 🖼️ + Chat IA 🤖\n"
+    + "="*70 + "\n\n"
+)
+
+_MENU = "\n".join([
+    "\n" + "-"*70,
+    "MENÚ PRINCIPAL",
+    "-"*70,
+    "  [1] Crear colecciones con validación de esquema",
+    "  [2] Crear índices",
+    "  [3] Cargar datos completos",
+    "  [4] Verificar datos cargados",
+    "  [5] Ejecutar setup completo",
+    "  [6] Verificar conexión a MongoDB",
+    "",
+    "  🔍 BÚSQUEDA VECTORIAL:",
+    "  [7] 🔍 Búsqueda vectorial de productos",
+    "  [8] 📝 Búsqueda de reseñas",
+    "  [9] 🖼️ Búsqueda por imagen",
+    "  [10] 🔄 Búsqueda híbrida (texto + imagen)",
+    "",
+    "  🤖 SISTEMA RAG:",
+    "  [11] 🤖 Consulta RAG con Groq",
+    "  [12] 💬 Chat interactivo RAG",
+    "  [13] 📊 Análisis de reseñas con IA",
+    "",
+    "  [0] Salir",
+    "-"*70,
+]) + "\n"
 
 
 def print_header():
     """Imprime el encabezado de la aplicación."""
-    print("\n" + "="*70)
-    print(" "*8 + "🚀 SISTEMA RAG MULTIMODAL - PRODUCTOS TECNOLÓGICOS")
-    print(" "*10 + "MongoDB Atlas + Groq LLM + Embeddings Vectoriales")
-    print(" "*15 + "Búsqueda por Texto 📝 + Imágenes 🖼️ + Chat IA 🤖")
-    print("="*70 + "\n")
+    sys.stdout.write(_HEADER)
 
 
 def print_menu():
     """Imprime el menú principal."""
-    print("\n" + "-"*70)
-    print("MENÚ PRINCIPAL")
-    print("-"*70)
-    print("  [1] Crear colecciones con validación de esquema")
-    print("  [2] Crear índices")
-    print("  [3] Cargar datos completos")
-    print("  [4] Verificar datos cargados")
-    print("  [5] Ejecutar setup completo")
-    print("  [6] Verificar conexión a MongoDB")
-    print("")
-    print("  🔍 BÚSQUEDA VECTORIAL:")
-    print("  [7] 🔍 Búsqueda vectorial de productos")
-    print("  [8] 📝 Búsqueda de reseñas")
-    print("  [9] 🖼️ Búsqueda por imagen")
-    print("  [10] 🔄 Búsqueda híbrida (texto + imagen)")
-    print("")
-    print("  🤖 SISTEMA RAG:")
-    print("  [11] 🤖 Consulta RAG con Groq")
-    print("  [12] 💬 Chat interactivo RAG")
-    print("  [13] 📊 Análisis de reseñas con IA")
-    print("")
-    print("  [0] Salir")
-    print("-"*70)
+    sys.stdout.write(_MENU)
+
+
+def _write_lines(lines):
+    """Escribe un bloque de líneas de resultados con una sola escritura a stdout."""
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
+def _invalidate_search_index():
+    """Descarta el índice local de productos y las respuestas RAG cacheadas de este proceso."""
+    # Sin importar search.vector_search si nunca se usó (evita cargar torch)
+    vector_search = sys.modules.get('search.vector_search')
+    if vector_search is not None:
+        vector_search.invalidate_local_index()
+    semantic_cache = sys.modules.get('rag.semantic_cache')
+    if semantic_cache is not None:
+        semantic_cache.clear_semantic_cache()
 
 
 # ==================== OPCIONES DE SETUP ====================
 
 def option_1_create_collections():
     """Opción 1: Crear colecciones."""
+    from scripts.create_collections import create_all_collections
     print("\n🏗️ CREAR COLECCIONES CON VALIDACIÓN")
     print("\nEsto creará las colecciones con esquemas de validación JSON:")
     print("  • categorias")
@@ -81,7 +127,7 @@ def option_1_create_collections():
     print("  • imagenesProducto")
     
     confirm = input("\n¿Continuar? (s/n): ").strip().lower()
-    if confirm in ['s', 'si', 'sí', 'y', 'yes']:
+    if confirm in _AFFIRM:
         try:
             create_all_collections()
             print("\n✅ Colecciones creadas exitosamente")
@@ -93,6 +139,7 @@ def option_1_create_collections():
 
 def option_2_create_indexes():
     """Opción 2: Crear índices."""
+    from scripts.create_indexes import create_all_indexes
     print("\n📇 CREAR ÍNDICES OPTIMIZADOS")
     print("\nEsto creará índices para:")
     print("  • Búsquedas por ID y códigos")
@@ -101,7 +148,7 @@ def option_2_create_indexes():
     print("  • Índices vectoriales (si Atlas Search está disponible)")
     
     confirm = input("\n¿Continuar? (s/n): ").strip().lower()
-    if confirm in ['s', 'si', 'sí', 'y', 'yes']:
+    if confirm in _AFFIRM:
         try:
             create_all_indexes()
             print("\n✅ Índices creados exitosamente")
@@ -113,6 +160,7 @@ def option_2_create_indexes():
 
 def option_3_load_data():
     """Opción 3: Cargar datos."""
+    from scripts.load_data import load_all_data
     print("\n📦 CARGAR DATOS COMPLETOS")
     print("\nEsto cargará:")
     print("  • Categorías y marcas")
@@ -122,9 +170,10 @@ def option_3_load_data():
     print("\n⚠️  ADVERTENCIA: Puede tomar 10-15 minutos")
     
     confirm = input("\n¿Continuar? (s/n): ").strip().lower()
-    if confirm in ['s', 'si', 'sí', 'y', 'yes']:
+    if confirm in _AFFIRM:
         try:
             load_all_data()
+            _invalidate_search_index()
             print("\n✅ Datos cargados exitosamente")
         except Exception as e:
             print(f"\n❌ Error: {str(e)}")
@@ -134,6 +183,7 @@ def option_3_load_data():
 
 def option_4_verify_data():
     """Opción 4: Verificar datos."""
+    from scripts.verify_data import verify_all_data
     print("\n🔍 VERIFICAR DATOS CARGADOS")
     try:
         verify_all_data()
@@ -145,6 +195,7 @@ def option_4_verify_data():
 
 def option_5_full_setup():
     """Opción 5: Setup completo."""
+    from scripts import create_all_collections, create_all_indexes, load_all_data
     print("\n🚀 SETUP COMPLETO DEL SISTEMA")
     print("\nEste proceso ejecutará:")
     print("  1. Crear colecciones con validación")
@@ -156,7 +207,7 @@ def option_5_full_setup():
     
     confirm = input("\n¿Deseas continuar? (s/n): ").strip().lower()
     
-    if confirm in ['s', 'si', 'sí', 'y', 'yes']:
+    if confirm in _AFFIRM:
         try:
             print("\n" + "="*70)
             print("INICIANDO SETUP COMPLETO")
@@ -175,6 +226,7 @@ def option_5_full_setup():
             # Paso 3: Cargar datos
             print("\n🔹 PASO 3/3: Cargando datos...")
             load_all_data()
+            _invalidate_search_index()
             print("✓ Datos cargados")
             
             print("\n" + "="*70)
@@ -206,6 +258,7 @@ def option_6_verify_connection():
 
 def option_7_vector_search():
     """Opción 7: Búsqueda vectorial."""
+    from search.vector_search import search_productos
     print("\n🔍 BÚSQUEDA VECTORIAL DE PRODUCTOS")
     query = input("\nIngresa tu consulta: ").strip()
     
@@ -238,14 +291,17 @@ def option_7_vector_search():
         )
         
         if resultados:
-            print(f"\n✅ {len(resultados)} resultados encontrados:\n")
+            lines = [f"\n✅ {len(resultados)} resultados encontrados:\n"]
             for i, prod in enumerate(resultados, 1):
-                print(f"{i}. {prod['nombre']}")
-                print(f"   Marca: {prod['marca']['nombre']}")
-                print(f"   Precio: ${prod['precioUsd']:.2f}")
-                print(f"   Similitud: {prod['search_score']:.3f}")
-                print(f"   Descripción: {prod['descripcion'][:100]}...")
-                print()
+                lines.extend([
+                    f"{i}. {prod['nombre']}",
+                    f"   Marca: {prod['marca']['nombre']}",
+                    f"   Precio: ${prod['precioUsd']:.2f}",
+                    f"   Similitud: {prod['search_score']:.3f}",
+                    f"   Descripción: {prod['descripcion'][:100]}...",
+                    ""
+                ])
+            _write_lines(lines)
         else:
             print("❌ No se encontraron resultados")
     
@@ -257,6 +313,7 @@ def option_7_vector_search():
 
 def option_8_search_reviews():
     """Opción 8: Búsqueda de reseñas."""
+    from search.vector_search import search_resenas
     print("\n📝 BÚSQUEDA DE RESEÑAS")
     query = input("\nIngresa tu consulta: ").strip()
     
@@ -269,24 +326,27 @@ def option_8_search_reviews():
     limit = int(limit) if limit.isdigit() else 5
     
     verified = input("¿Solo compradores verificados? (s/n): ").strip().lower()
-    verified_only = verified in ['s', 'si', 'sí', 'y', 'yes']
+    verified_only = verified in _AFFIRM
     
     try:
         resenas = search_resenas(query, limit=limit, verified_only=verified_only)
         
         if resenas:
-            print(f"\n✅ {len(resenas)} reseñas encontradas:\n")
+            lines = [f"\n✅ {len(resenas)} reseñas encontradas:\n"]
             for i, r in enumerate(resenas, 1):
                 usuario = r['nombreUsuario']
                 verificado = "✓" if r['compradorVerificado'] else ""
                 score = r['search_score']
                 resena = r['resena']
                 
-                print(f"{i}. Usuario: {usuario} {verificado} (Score: {score:.3f})")
-                print(f"   Calificación: {resena['calificacion']}/5")
-                print(f"   Título: {resena['titulo']}")
-                print(f"   Contenido: {resena['contenido'][:150]}...")
-                print()
+                lines.extend([
+                    f"{i}. Usuario: {usuario} {verificado} (Score: {score:.3f})",
+                    f"   Calificación: {resena['calificacion']}/5",
+                    f"   Título: {resena['titulo']}",
+                    f"   Contenido: {resena['contenido'][:150]}...",
+                    ""
+                ])
+            _write_lines(lines)
         else:
             print("❌ No se encontraron reseñas")
     
@@ -298,6 +358,7 @@ def option_8_search_reviews():
 
 def option_9_search_by_image():
     """Opción 9: Búsqueda por imagen."""
+    from search.vector_search import search_by_image
     print("\n🖼️ BÚSQUEDA POR IMAGEN")
     print("\nFormatos soportados: JPG, PNG, JPEG")
     
@@ -310,11 +371,10 @@ def option_9_search_by_image():
     # Verificar si la ruta es absoluta o relativa
     if not os.path.isabs(image_path):
         # Si es relativa, buscar en el directorio de imágenes del proyecto
-        images_dir = os.path.join(os.path.dirname(__file__), "data", "images")
-        image_path = os.path.join(images_dir, image_path)
+        image_path = os.path.join(_IMAGES_DIR, image_path)
     
     include_reviews = input("¿Incluir reseñas relacionadas? (s/n): ").strip().lower()
-    include_reviews = include_reviews in ['s', 'si', 'sí', 'y', 'yes']
+    include_reviews = include_reviews in _AFFIRM
     
     try:
         resultado = search_by_image(
@@ -329,25 +389,28 @@ def option_9_search_by_image():
         else:
             productos = resultado.get("productos_similares", [])
             if productos:
-                print(f"\n✅ {len(productos)} productos similares encontrados:\n")
+                lines = [f"\n✅ {len(productos)} productos similares encontrados:\n"]
                 for i, prod in enumerate(productos, 1):
                     img_info = prod["imagen_similar"]
-                    print(f"{i}. {prod['nombre']}")
-                    print(f"   Marca: {prod['marca']['nombre']}")
-                    print(f"   Precio: ${prod['precioUsd']:.2f}")
-                    print(f"   Similitud visual: {img_info['similarity_score']:.3f}")
-                    print(f"   Imagen: {img_info['rutaImagen']}")
-                    print()
+                    lines.extend([
+                        f"{i}. {prod['nombre']}",
+                        f"   Marca: {prod['marca']['nombre']}",
+                        f"   Precio: ${prod['precioUsd']:.2f}",
+                        f"   Similitud visual: {img_info['similarity_score']:.3f}",
+                        f"   Imagen: {img_info['rutaImagen']}",
+                        ""
+                    ])
                 
                 # Mostrar reseñas si se incluyeron
                 if include_reviews and "resenas_relacionadas" in resultado:
                     resenas = resultado["resenas_relacionadas"]
                     if resenas:
-                        print(f"📝 Reseñas relacionadas ({len(resenas)}):")
+                        lines.append(f"📝 Reseñas relacionadas ({len(resenas)}):")
                         for i, r in enumerate(resenas, 1):
                             resena = r['resena']
-                            print(f"{i}. {r['nombreUsuario']}: {resena['titulo']}")
-                            print(f"   {resena['contenido'][:100]}...")
+                            lines.append(f"{i}. {r['nombreUsuario']}: {resena['titulo']}")
+                            lines.append(f"   {resena['contenido'][:100]}...")
+                _write_lines(lines)
             else:
                 print("❌ No se encontraron productos similares")
     
@@ -359,6 +422,7 @@ def option_9_search_by_image():
 
 def option_10_hybrid_search():
     """Opción 10: Búsqueda híbrida."""
+    from search.vector_search import hybrid_search
     print("\n🔄 BÚSQUEDA HÍBRIDA (TEXTO + IMAGEN)")
     
     text_query = input("\nConsulta de texto (opcional): ").strip() or None
@@ -371,8 +435,7 @@ def option_10_hybrid_search():
     
     # Procesar ruta de imagen si es relativa
     if image_path and not os.path.isabs(image_path):
-        images_dir = os.path.join(os.path.dirname(__file__), "data", "images")
-        image_path = os.path.join(images_dir, image_path)
+        image_path = os.path.join(_IMAGES_DIR, image_path)
     
     try:
         resultado = hybrid_search(
@@ -381,37 +444,39 @@ def option_10_hybrid_search():
             limit=8
         )
         
-        print(f"\n🔍 Resultados de búsqueda híbrida:")
+        lines = [f"\n🔍 Resultados de búsqueda híbrida:"]
         
         # Mostrar resultados combinados si hay ambos tipos de búsqueda
         if text_query and image_path:
             productos_combinados = resultado.get("productos_combinados", [])
             if productos_combinados:
-                print(f"\n✅ {len(productos_combinados)} productos combinados:")
+                lines.append(f"\n✅ {len(productos_combinados)} productos combinados:")
                 for i, prod in enumerate(productos_combinados, 1):
                     relevancia = prod.get("relevancia", "combinada")
                     emoji = "🎯" if relevancia == "alta" else "📝" if relevancia == "texto" else "🖼️"
-                    print(f"{i}. {emoji} {prod['nombre']} - ${prod['precioUsd']:.2f}")
+                    lines.append(f"{i}. {emoji} {prod['nombre']} - ${prod['precioUsd']:.2f}")
                     if "search_score" in prod:
-                        print(f"   Similitud texto: {prod['search_score']:.3f}")
+                        lines.append(f"   Similitud texto: {prod['search_score']:.3f}")
             else:
-                print("❌ No se encontraron productos combinados")
+                lines.append("❌ No se encontraron productos combinados")
         else:
             # Mostrar resultados individuales
             if text_query:
                 productos_texto = resultado.get("productos_texto", [])
                 if productos_texto:
-                    print(f"\n📝 Resultados por texto ({len(productos_texto)}):")
+                    lines.append(f"\n📝 Resultados por texto ({len(productos_texto)}):")
                     for i, prod in enumerate(productos_texto, 1):
-                        print(f"{i}. {prod['nombre']} - Score: {prod['search_score']:.3f}")
+                        lines.append(f"{i}. {prod['nombre']} - Score: {prod['search_score']:.3f}")
             
             if image_path:
                 productos_imagen = resultado.get("productos_imagen", [])
                 if productos_imagen:
-                    print(f"\n🖼️ Resultados por imagen ({len(productos_imagen)}):")
+                    lines.append(f"\n🖼️ Resultados por imagen ({len(productos_imagen)}):")
                     for i, prod in enumerate(productos_imagen, 1):
                         score = prod["imagen_similar"]["similarity_score"]
-                        print(f"{i}. {prod['nombre']} - Score visual: {score:.3f}")
+                        lines.append(f"{i}. {prod['nombre']} - Score visual: {score:.3f}")
+        
+        _write_lines(lines)
     
     except Exception as e:
         print(f"❌ Error: {str(e)}")
@@ -423,6 +488,7 @@ def option_10_hybrid_search():
 
 def option_11_rag_query():
     """Opción 11: Consulta RAG."""
+    from rag.groq_rag import rag_query_productos
     print("\n🤖 CONSULTA RAG CON GROQ")
     print("\nEl sistema buscará productos relevantes y generará una respuesta inteligente")
     question = input("\nTu pregunta: ").strip()
@@ -457,6 +523,7 @@ def option_11_rag_query():
 
 def option_12_chat_interactive():
     """Opción 12: Chat interactivo."""
+    from rag.groq_rag import chat_interactive
     print("\n💬 INICIANDO CHAT INTERACTIVO RAG")
     try:
         chat_interactive()
@@ -468,6 +535,7 @@ def option_12_chat_interactive():
 
 def option_13_analyze_reviews():
     """Opción 13: Análisis de reseñas."""
+    from rag.groq_rag import rag_query_resenas
     print("\n📊 ANÁLISIS DE RESEÑAS CON IA")
     question = input("\n¿Qué aspecto quieres analizar en las reseñas?: ").strip()
     
@@ -494,10 +562,96 @@ def option_13_analyze_reviews():
     input("\nPresiona Enter para continuar...")
 
 
+# ==================== MODO NO INTERACTIVO ====================
+
+# Acciones que eliminan o sobrescriben datos y requieren --yes
+_DESTRUCTIVE_ACTIONS = frozenset({'collections', 'load', 'setup'})
+
+
+def run_action(action, assume_yes=False):
+    """
+    Ejecuta una acción de setup sin menú, sin limpiar pantalla y sin input().
+    
+    Args:
+        action (str): collections, indexes, load, verify, setup o check
+        assume_yes (bool): Confirma automáticamente las acciones destructivas
+        
+    Returns:
+        int: Código de salida (0 si la acción terminó correctamente)
+    """
+    if action in _DESTRUCTIVE_ACTIONS and not assume_yes:
+        print(f"❌ La acción '{action}' modifica datos; usa --yes para confirmar")
+        return 1
+    
+    from scripts import create_all_collections, create_all_indexes, load_all_data, verify_all_data
+    
+    try:
+        if action == 'collections':
+            if not create_all_collections():
+                return 1
+        elif action == 'indexes':
+            if not create_all_indexes():
+                return 1
+        elif action == 'load':
+            if not load_all_data():
+                return 1
+        elif action == 'verify':
+            if not verify_all_data():
+                return 1
+        elif action == 'setup':
+            # Se detiene en el primer paso que falle
+            for paso in (create_all_collections, create_all_indexes, load_all_data):
+                if not paso():
+                    return 1
+        elif action == 'check':
+            if not verify_connection():
+                return 1
+    except Exception as e:
+        print(f"\n❌ Error: {str(e)}")
+        return 1
+    
+    print(f"\n✅ Acción '{action}' completada")
+    return 0
+
+
+def parse_args(argv=None):
+    """Procesa los argumentos de línea de comandos."""
+    parser = argparse.ArgumentParser(description="Sistema RAG Multimodal - Productos Tecnológicos")
+    parser.add_argument(
+        '--action',
+        choices=['collections', 'indexes', 'load', 'verify', 'setup', 'check'],
+        default=None,
+        help="Ejecuta la acción indicada sin mostrar el menú interactivo"
+    )
+    parser.add_argument(
+        '--yes',
+        action='store_true',
+        help="Confirma automáticamente las acciones que modifican datos"
+    )
+    return parser.parse_args(argv)
+
+
 # ==================== FUNCIÓN PRINCIPAL ====================
 
-def main():
+def _preload_search_models():
+    """Importa el módulo de búsqueda y carga sus modelos (hilo en segundo plano)."""
+    try:
+        from search.vector_search import preload_models
+    except Exception:
+        # Dependencias ausentes: las opciones de búsqueda mostrarán el error
+        return
+    preload_models()
+
+
+def main(argv=None):
     """Función principal de la aplicación."""
+    args = parse_args(argv)
+    if args.action:
+        sys.exit(run_action(args.action, assume_yes=args.yes))
+    
+    if _PRELOAD_MODELS:
+        threading.Thread(target=_preload_search_models, daemon=True).start()
+    
     while True:
         try:
             clear_screen()
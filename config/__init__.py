@@ -7,11 +7,20 @@ from .settings import (
     TEXT_EMBEDDING_DIM,
     IMAGE_EMBEDDING_DIM,
     EMBEDDING_MODEL_NAME,
+    EMBEDDING_CACHE_DIR,
+    EMBEDDING_CACHE_ENABLED,
+    LOCAL_INDEX_MAX_DOCS,
+    LOCAL_INDEX_TTL_SECONDS,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES,
+    BATCH_SIZE,
     COLLECTIONS,
     DISPONIBILIDAD_ENUM,
     IDIOMAS_ENUM,
     TIPO_IMAGEN_ENUM,
     ANGULO_VISTA_ENUM,
+    CORREO_PATTERN,
     DATA_FILES
 )
 
@@ -21,10 +30,19 @@ __all__ = [
     'TEXT_EMBEDDING_DIM',
     'IMAGE_EMBEDDING_DIM',
     'EMBEDDING_MODEL_NAME',
+    'EMBEDDING_CACHE_DIR',
+    'EMBEDDING_CACHE_ENABLED',
+    'LOCAL_INDEX_MAX_DOCS',
+    'LOCAL_INDEX_TTL_SECONDS',
+    'SEMANTIC_CACHE_ENABLED',
+    'SEMANTIC_CACHE_THRESHOLD',
+    'SEMANTIC_CACHE_MAX_ENTRIES',
+    'BATCH_SIZE',
     'COLLECTIONS',
     'DISPONIBILIDAD_ENUM',
     'IDIOMAS_ENUM',
     'TIPO_IMAGEN_ENUM',
     'ANGULO_VISTA_ENUM',
+    'CORREO_PATTERN',
     'DATA_FILES'
 ]
@@ -3,6 +3,7 @@ Configuración y conexión a MongoDB Atlas.
 """
 
 import os
+import threading
 from pymongo import MongoClient
 from pymongo.server_api import ServerApi
 from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
@@ -11,21 +12,62 @@ from dotenv import load_dotenv
 # Cargar variables de entorno
 load_dotenv()
 
+# Cliente compartido (un único pool de conexiones por proceso) y bases de datos por nombre
+_client = None
+_db_cache = {}
+_client_lock = threading.Lock()
+
 
 def get_database():
     """
     Establece conexión con MongoDB Atlas y retorna el objeto de base de datos.
     
+    El cliente se crea y verifica solo en la primera llamada; las siguientes
+    reutilizan el mismo MongoClient y su pool de conexiones. Es seguro
+    llamarla desde varios hilos (por ejemplo, peticiones Flask concurrentes).
+    
     Returns:
         Database: Objeto de base de datos de MongoDB
         
+    Raises:
+        ConnectionFailure: Si no se puede conectar a MongoDB
+        ValueError: Si faltan variables de entorno
+    """
+    global _client
+    
+    database_name = os.getenv("DATABASE_NAME", "productos_tecnologicos")
+    
+    # Camino rápido: base de datos ya resuelta, sin lock ni round-trip
+    db = _db_cache.get(database_name)
+    if db is not None:
+        return db
+    
+    with _client_lock:
+        db = _db_cache.get(database_name)
+        if db is not None:
+            return db
+        
+        if _client is None:
+            _client = _create_client()
+        
+        db = _client[database_name]
+        _db_cache[database_name] = db
+        return db
+
+
+def _create_client():
+    """
+    Crea el MongoClient compartido y verifica la conexión con un ping.
+    
+    Returns:
+        MongoClient: Cliente conectado a MongoDB Atlas
+        
     Raises:
         ConnectionFailure: Si no se puede conectar a MongoDB
         ValueError: Si faltan variables de entorno
     """
     # Obtener URI de MongoDB desde variables de entorno
     mongo_uri = os.getenv("MONGODB_URI")
-    database_name = os.getenv("DATABASE_NAME", "productos_tecnologicos")
     
     if not mongo_uri:
         raise ValueError(
@@ -38,18 +80,15 @@ def get_database():
         client = MongoClient(
             mongo_uri,
             server_api=ServerApi('1'),
-            serverSelectionTimeoutMS=5000
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=int(os.getenv("MONGODB_MAX_POOL_SIZE", "50")),
+            minPoolSize=int(os.getenv("MONGODB_MIN_POOL_SIZE", "5")),
+            retryWrites=True
         )
         
-        # Verificar conexión con ping
+        # Verificar conexión con ping (solo al crear el cliente)
         client.admin.command('ping')
-        
-        print(f"✓ Conexión exitosa a MongoDB Atlas")
-        print(f"✓ Base de datos: {database_name}")
-        
-        # Retornar objeto de base de datos
-        db = client[database_name]
-        return db
+        return client
         
     except ServerSelectionTimeoutError:
         raise ConnectionFailure(
@@ -71,6 +110,8 @@ def verify_connection():
     """
     try:
         db = get_database()
+        print(f"✓ Conexión exitosa a MongoDB Atlas")
+        print(f"✓ Base de datos: {db.name}")
         # Intentar listar colecciones como prueba adicional
         collections = db.list_collection_names()
         print(f"✓ Verificación exitosa. Colecciones encontradas: {len(collections)}")
@@ -2,6 +2,9 @@
 Configuraciones generales del sistema RAG de productos tecnológicos.
 """
 
+import os
+import re
+
 # Configuración de embeddings
 TEXT_EMBEDDING_DIM = 384  # Dimensiones para embeddings de texto (sentence-transformers)
 IMAGE_EMBEDDING_DIM = 512  # Dimensiones para embeddings de imágenes (CLIP)
@@ -9,6 +12,20 @@ IMAGE_EMBEDDING_DIM = 512  # Dimensiones para embeddings de imágenes (CLIP)
 # Modelo de embeddings de texto
 EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
 
+# Caché en disco de embeddings de consultas (texto e imágenes)
+EMBEDDING_CACHE_DIR = os.path.expanduser(os.getenv("RAG_CACHE_DIR", "~/.cache/rag_multimodal"))
+EMBEDDING_CACHE_ENABLED = os.getenv("RAG_EMBED_CACHE", "1") != "0"
+
+# Índice vectorial local de productos (matriz NumPy en memoria)
+# Por encima de LOCAL_INDEX_MAX_DOCS se vuelve a la búsqueda directa en MongoDB
+LOCAL_INDEX_MAX_DOCS = int(os.getenv("LOCAL_INDEX_MAX_DOCS", "50000"))
+LOCAL_INDEX_TTL_SECONDS = int(os.getenv("LOCAL_INDEX_TTL_SECONDS", "300"))
+
+# Caché semántica de respuestas RAG (preguntas casi idénticas reutilizan la respuesta)
+SEMANTIC_CACHE_ENABLED = os.getenv("RAG_SEMANTIC_CACHE", "1") != "0"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("RAG_SEMANTIC_CACHE_THRESHOLD", "0.95"))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("RAG_SEMANTIC_CACHE_MAX_ENTRIES", "10000"))
+
 # Nombres de colecciones
 # Marcas: EMBEBIDAS en productos (no colección independiente)
 # Reseñas: EMBEBIDAS en usuarios (no colección independiente)
@@ -30,10 +47,14 @@ DATA_FILES = {
 }
 
 # Configuración de validación
-DISPONIBILIDAD_ENUM = ["en_stock", "agotado", "pre_orden", "descontinuado"]
-IDIOMAS_ENUM = ["es", "en", "pt", "fr", "de"]
-TIPO_IMAGEN_ENUM = ["foto_producto", "lifestyle", "detalle", "comparativa"]
-ANGULO_VISTA_ENUM = ["frontal", "posterior", "lateral", "superior", "uso"]
+DISPONIBILIDAD_ENUM = ("en_stock", "agotado", "pre_orden", "descontinuado")
+IDIOMAS_ENUM = ("es", "en", "pt", "fr", "de")
+TIPO_IMAGEN_ENUM = ("foto_producto", "lifestyle", "detalle", "comparativa")
+ANGULO_VISTA_ENUM = ("frontal", "posterior", "lateral", "superior", "uso")
+
+# Formato de correo: se valida en la aplicación (el esquema de MongoDB solo
+# comprueba longitud y la presencia de '@')
+CORREO_PATTERN = re.compile(r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$")
 
 # Rangos de validación
 CALIFICACION_MIN = 1
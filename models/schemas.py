@@ -10,7 +10,7 @@ class MarcaSchema:
     """Esquema para la colección de marcas."""
     
     @staticmethod
-    def create(nombre, pais, sitio_web="", descripcion=""):
+    def create(nombre, pais, sitio_web="", descripcion="", now=None):
         """
         Crea un documento de marca.
         
@@ -19,16 +19,18 @@ class MarcaSchema:
             pais (str): País de origen
             sitio_web (str): URL del sitio web oficial
             descripcion (str): Descripción de la marca
+            now (datetime): Marca de tiempo compartida por el lote (por defecto, la actual)
             
         Returns:
             dict: Documento de marca
         """
+        now = now or datetime.now()
         return {
             "nombre": nombre,
             "pais": pais,
             "sitio_web": sitio_web,
             "descripcion": descripcion,
-            "fecha_creacion": datetime.now()
+            "fecha_creacion": now
         }
 
 
@@ -36,7 +38,7 @@ class CategoriaSchema:
     """Esquema para la colección de categorías."""
     
     @staticmethod
-    def create(nombre, slug, descripcion="", id_categoria_padre=None):
+    def create(nombre, slug, descripcion="", id_categoria_padre=None, now=None):
         """
         Crea un documento de categoría.
         
@@ -45,16 +47,18 @@ class CategoriaSchema:
             slug (str): Slug para URLs
             descripcion (str): Descripción de la categoría
             id_categoria_padre (ObjectId): ID de categoría padre (opcional)
+            now (datetime): Marca de tiempo compartida por el lote (por defecto, la actual)
             
         Returns:
             dict: Documento de categoría
         """
+        now = now or datetime.now()
         return {
             "nombre": nombre,
             "slug": slug,
             "descripcion": descripcion,
             "id_categoria_padre": id_categoria_padre,
-            "fecha_creacion": datetime.now()
+            "fecha_creacion": now
         }
 
 
@@ -62,7 +66,7 @@ class UsuarioSchema:
     """Esquema para la colección de usuarios."""
     
     @staticmethod
-    def create(nombre_usuario, correo, nombre_completo="", comprador_verificado=False):
+    def create(nombre_usuario, correo, nombre_completo="", comprador_verificado=False, now=None):
         """
         Crea un documento de usuario.
         
@@ -71,17 +75,19 @@ class UsuarioSchema:
             correo (str): Correo electrónico
             nombre_completo (str): Nombre completo del usuario
             comprador_verificado (bool): Si ha realizado compras verificadas
+            now (datetime): Marca de tiempo compartida por el lote (por defecto, la actual)
             
         Returns:
             dict: Documento de usuario
         """
+        now = now or datetime.now()
         return {
             "nombre_usuario": nombre_usuario,
             "correo": correo,
             "nombre_completo": nombre_completo,
             "comprador_verificado": comprador_verificado,
-            "fecha_creacion": datetime.now(),
-            "ultimo_acceso": datetime.now()
+            "fecha_creacion": now,
+            "ultimo_acceso": now
         }
 
 
@@ -103,7 +109,8 @@ class ProductoSchema:
         fecha_lanzamiento,
         disponibilidad="en_stock",
         descripcion_embedding=None,
-        imagen_principal=""
+        imagen_principal="",
+        now=None
     ):
         """
         Crea un documento de producto.
@@ -123,10 +130,12 @@ class ProductoSchema:
             disponibilidad (str): Estado de disponibilidad
             descripcion_embedding (list): Vector de embedding
             imagen_principal (str): URL de imagen principal
+            now (datetime): Marca de tiempo compartida por el lote (por defecto, la actual)
             
         Returns:
             dict: Documento de producto
         """
+        now = now or datetime.now()
         return {
             "codigo_producto": codigo_producto,
             "nombre": nombre,
@@ -150,8 +159,8 @@ class ProductoSchema:
             },
             "descripcion_embedding": descripcion_embedding or [],
             "imagen_principal": imagen_principal,
-            "fecha_creacion": datetime.now(),
-            "fecha_actualizacion": datetime.now()
+            "fecha_creacion": now,
+            "fecha_actualizacion": now
         }
 
 
@@ -172,7 +181,8 @@ class ResenaSchema:
         idioma="es",
         votos_utiles=0,
         compra_verificada=False,
-        contenido_embedding=None
+        contenido_embedding=None,
+        now=None
     ):
         """
         Crea un documento de reseña.
@@ -191,10 +201,12 @@ class ResenaSchema:
             votos_utiles (int): Número de votos útiles
             compra_verificada (bool): Si la compra está verificada
             contenido_embedding (list): Vector de embedding
+            now (datetime): Marca de tiempo compartida por el lote (por defecto, la actual)
             
         Returns:
             dict: Documento de reseña
         """
+        now = now or datetime.now()
         return {
             "id_producto": id_producto,
             "id_usuario": id_usuario,
@@ -211,8 +223,8 @@ class ResenaSchema:
             "votos_utiles": votos_utiles,
             "compra_verificada": compra_verificada,
             "contenido_embedding": contenido_embedding or [],
-            "fecha_creacion": datetime.now(),
-            "fecha_actualizacion": datetime.now()
+            "fecha_creacion": now,
+            "fecha_actualizacion": now
         }
 
 
@@ -229,7 +241,8 @@ class ImagenProductoSchema:
         texto_alternativo="",
         es_principal=False,
         orden_visualizacion=1,
-        imagen_embedding=None
+        imagen_embedding=None,
+        now=None
     ):
         """
         Crea un documento de imagen de producto.
@@ -244,10 +257,12 @@ class ImagenProductoSchema:
             es_principal (bool): Si es la imagen principal
             orden_visualizacion (int): Orden de visualización
             imagen_embedding (list): Vector de embedding
+            now (datetime): Marca de tiempo compartida por el lote (por defecto, la actual)
             
         Returns:
             dict: Documento de imagen
         """
+        now = now or datetime.now()
         return {
             "id_producto": id_producto,
             "url_imagen": url_imagen,
@@ -258,5 +273,5 @@ class ImagenProductoSchema:
             "texto_alternativo": texto_alternativo,
             "es_principal": es_principal,
             "orden_visualizacion": orden_visualizacion,
-            "fecha_subida": datetime.now()
+            "fecha_subida": now
         }
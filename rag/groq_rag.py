@@ -3,9 +3,176 @@ Sistema RAG usando Groq como LLM.
 Adaptado del rag_llm.py existente.
 """
 
+import importlib.util
 import os
-from typing import List, Dict, Any
-from search.vector_search import search_productos, search_resenas
+import random
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Tuple
+from search.vector_search import search_productos, search_resenas, generate_text_embedding
+from rag.semantic_cache import get_semantic_cache
+
+# Cliente Groq compartido: reutiliza la sesión HTTP (TLS + keep-alive) entre consultas
+_groq_client = None
+
+# Instrucciones fijas en un mensaje de sistema: idénticas en todas las llamadas,
+# así Groq puede reutilizar el prefijo cacheado y solo varía el mensaje de usuario
+_SYSTEM_PROMPT = (
+    "Eres un asistente experto en productos tecnológicos. Tu trabajo es responder preguntas "
+    "basándote ÚNICAMENTE en la información proporcionada.\n\n"
+    "INSTRUCCIONES:\n"
+    "- Responde SOLO con información del contexto proporcionado\n"
+    "- Si la información no está en el contexto, di \"No tengo información suficiente\"\n"
+    "- Sé específico y menciona nombres de productos, precios y características\n"
+    "- Sé conciso pero completo\n"
+    "- Responde en español"
+)
+
+# Plantilla del mensaje de usuario: solo se concatenan contexto y pregunta en cada llamada
+_PROMPT_HEAD = "CONTEXTO DE LA BASE DE DATOS:\n"
+_PROMPT_MID = "\n\nPREGUNTA DEL USUARIO:\n"
+_PROMPT_TAIL = "\n\nRESPUESTA:"
+
+# Generación determinista: misma pregunta y contexto -> misma respuesta
+GROQ_MODEL = "llama-3.1-8b-instant"
+GROQ_TEMPERATURE = 0.0
+GROQ_SEED = 42
+GROQ_MAX_TOKENS = 1000
+
+# Respuestas guardadas por prompt exacto (se consulta antes de llamar a Groq)
+PROMPT_CACHE_SIZE = 2048
+
+# Conexiones HTTP mantenidas abiertas hacia api.groq.com
+GROQ_MAX_CONNECTIONS = 32
+
+# Reintentos ante 429 / errores de red (backoff exponencial con jitter)
+GROQ_MAX_ATTEMPTS = 5
+GROQ_BACKOFF_MIN = 1.0
+GROQ_BACKOFF_MAX = 30.0
+
+# Cuota de tokens por minuto del plan de Groq (0 desactiva el control)
+GROQ_TOKENS_PER_MINUTE = int(os.getenv("GROQ_TOKENS_PER_MINUTE", "6000"))
+
+# Ventana deslizante de 60 s con (instante, tokens estimados) de cada llamada
+_token_window = deque()
+_token_window_lock = threading.Lock()
+
+
+def get_groq_client():
+    """
+    Obtiene el cliente de Groq (singleton).
+    
+    Returns:
+        Groq: Cliente configurado con GROQ_API_KEY
+        
+    Raises:
+        ValueError: Si la API key no está configurada
+        ImportError: Si la librería groq no está instalada
+    """
+    global _groq_client
+    if _groq_client is None:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key or api_key.startswith("tu_"):
+            raise ValueError("GROQ_API_KEY no configurada")
+        
+        import httpx
+        from groq import Groq
+        
+        # Pool de conexiones keep-alive; HTTP/2 solo si el paquete h2 está instalado
+        http_client = httpx.Client(
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=httpx.Limits(
+                max_connections=GROQ_MAX_CONNECTIONS,
+                max_keepalive_connections=GROQ_MAX_CONNECTIONS
+            ),
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
+        # Los reintentos los gestiona create_chat_completion
+        _groq_client = Groq(api_key=api_key, max_retries=0, http_client=http_client)
+    return _groq_client
+
+
+def _wait_for_token_budget(estimated_tokens: int):
+    """
+    Espera hasta que la ventana de los últimos 60 s admita la siguiente llamada.
+    
+    Args:
+        estimated_tokens: Tokens estimados de la llamada (prompt + respuesta)
+    """
+    if GROQ_TOKENS_PER_MINUTE <= 0:
+        return
+    
+    with _token_window_lock:
+        while True:
+            now = time.monotonic()
+            while _token_window and now - _token_window[0][0] >= 60:
+                _token_window.popleft()
+            
+            usados = sum(tokens for _, tokens in _token_window)
+            if not _token_window or usados + estimated_tokens <= GROQ_TOKENS_PER_MINUTE:
+                _token_window.append((now, estimated_tokens))
+                return
+            
+            espera = 60 - (now - _token_window[0][0])
+            print(f"⏳ Límite de tokens por minuto alcanzado, esperando {espera:.1f}s...")
+            time.sleep(espera)
+
+
+def create_chat_completion(client, messages: List[Dict], **kwargs):
+    """
+    Llama a chat.completions.create con control de cuota y reintentos.
+    
+    Reintenta con backoff exponencial (1s, 2s, 4s... hasta 30s, con jitter)
+    ante límites de tasa, timeouts, errores de conexión y errores 5xx,
+    respetando la cabecera retry-after cuando Groq la envía.
+    
+    Args:
+        client: Cliente de Groq
+        messages: Mensajes del chat
+        **kwargs: Parámetros adicionales (model, temperature, max_tokens...)
+        
+    Returns:
+        Respuesta de chat.completions.create
+    """
+    import groq
+    
+    reintentables = (
+        groq.RateLimitError,
+        groq.APIConnectionError,  # incluye APITimeoutError
+        groq.InternalServerError
+    )
+    
+    # Estimación aproximada: ~4 caracteres por token
+    estimated_tokens = sum(len(m["content"]) for m in messages) // 4 + kwargs.get("max_tokens", 0)
+    
+    for intento in range(1, GROQ_MAX_ATTEMPTS + 1):
+        _wait_for_token_budget(estimated_tokens)
+        try:
+            return client.chat.completions.create(messages=messages, **kwargs)
+        except reintentables as e:
+            if intento == GROQ_MAX_ATTEMPTS:
+                raise
+            
+            espera = min(GROQ_BACKOFF_MAX, GROQ_BACKOFF_MIN * 2 ** (intento - 1))
+            response = getattr(e, "response", None)
+            retry_after = response.headers.get("retry-after") if response is not None else None
+            try:
+                espera = max(espera, float(retry_after))
+            except (TypeError, ValueError):
+                espera += random.uniform(0, espera / 2)
+            
+            print(f"⚠ Groq no disponible ({type(e).__name__}), reintento {intento}/{GROQ_MAX_ATTEMPTS - 1} en {espera:.1f}s")
+            time.sleep(espera)
+
+
+def _marca_nombre(prod: Dict) -> str:
+    """Nombre de la marca embebida (el esquema la exige; "N/A" si falta)."""
+    try:
+        return prod["marca"]["nombre"]
+    except (KeyError, TypeError):
+        return "N/A"
 
 
 def build_context_from_productos(productos: List[Dict]) -> str:
@@ -21,21 +188,13 @@ def build_context_from_productos(productos: List[Dict]) -> str:
     if not productos:
         return "No se encontraron productos relevantes."
     
-    context_parts = []
-    for i, prod in enumerate(productos, 1):
-        marca = prod.get("marca", {}).get("nombre", "N/A")
-        precio = prod.get("precioUsd", 0)
-        rating = prod.get("calificacionPromedio", 0)
-        num_reviews = prod.get("cantidadResenas", 0)
-        
-        context_parts.append(
-            f"{i}. {prod['nombre']} (Marca: {marca})\n"
-            f"   Precio: ${precio:.2f} USD\n"
-            f"   Calificación: {rating:.1f}/5.0 ({num_reviews} reseñas)\n"
-            f"   Descripción: {prod['descripcion']}\n"
-        )
-    
-    return "\n".join(context_parts)
+    return "\n".join([
+        f"{i}. {prod['nombre']} (Marca: {_marca_nombre(prod)})\n"
+        f"   Precio: ${prod.get('precioUsd', 0):.2f} USD\n"
+        f"   Calificación: {prod.get('calificacionPromedio', 0):.1f}/5.0 ({prod.get('cantidadResenas', 0)} reseñas)\n"
+        f"   Descripción: {prod['descripcion']}\n"
+        for i, prod in enumerate(productos, 1)
+    ])
 
 
 def build_context_from_resenas(resenas: List[Dict]) -> str:
@@ -51,20 +210,54 @@ def build_context_from_resenas(resenas: List[Dict]) -> str:
     if not resenas:
         return "No se encontraron reseñas relevantes."
     
-    context_parts = []
-    for i, item in enumerate(resenas, 1):
-        resena = item["resena"]
-        usuario = item["nombreUsuario"]
-        verificado = "✓ Comprador verificado" if item["compradorVerificado"] else ""
+    return "\n".join([
+        f"{i}. Reseña de {item['nombreUsuario']} {'✓ Comprador verificado' if item['compradorVerificado'] else ''}\n"
+        f"   Calificación: {resena['calificacion']}/5\n"
+        f"   {resena['titulo']}\n"
+        f"   {resena['contenido']}\n"
+        for i, item in enumerate(resenas, 1)
+        for resena in (item["resena"],)
+    ])
+
+
+def _build_prompt(question: str, context: str) -> str:
+    """Arma el mensaje de usuario del prompt RAG a partir de la plantilla precalculada."""
+    return _PROMPT_HEAD + context + _PROMPT_MID + question + _PROMPT_TAIL
+
+
+def _build_messages(prompt: str) -> List[Dict]:
+    """Mensajes del chat: instrucciones de sistema fijas + prompt de usuario."""
+    return [
+        {"role": "system", "content": _SYSTEM_PROMPT},
+        {"role": "user", "content": prompt}
+    ]
+
+
+@lru_cache(maxsize=PROMPT_CACHE_SIZE)
+def _cached_completion(prompt: str) -> str:
+    """
+    Obtiene la respuesta de Groq para un prompt, memorizada por prompt exacto.
+    
+    Las excepciones no se memorizan: un error se reintenta en la siguiente llamada.
+    
+    Args:
+        prompt: Prompt completo
         
-        context_parts.append(
-            f"{i}. Reseña de {usuario} {verificado}\n"
-            f"   Calificación: {resena['calificacion']}/5\n"
-            f"   {resena['titulo']}\n"
-            f"   {resena['contenido']}\n"
-        )
+    Returns:
+        Texto de la respuesta
+    """
+    print("🤖 Groq está generando la respuesta...")
     
-    return "\n".join(context_parts)
+    chat_completion = create_chat_completion(
+        get_groq_client(),
+        messages=_build_messages(prompt),
+        model=GROQ_MODEL,
+        temperature=GROQ_TEMPERATURE,
+        seed=GROQ_SEED,
+        max_tokens=GROQ_MAX_TOKENS
+    )
+    
+    return chat_completion.choices[0].message.content
 
 
 def generate_rag_response(
@@ -72,7 +265,7 @@ def generate_rag_response(
     context: str
 ) -> str:
     """
-    Genera respuesta usando Groq con contexto RAG.
+    Genera respuesta usando Groq con contexto RAG (determinista: temperature 0 y seed fija).
     
     Args:
         question: Pregunta del usuario
@@ -82,59 +275,116 @@ def generate_rag_response(
         Respuesta generada por el LLM
     """
     try:
-        from groq import Groq
-        
-        # Configurar cliente Groq
-        api_key = os.getenv("GROQ_API_KEY")
-        if not api_key or api_key.startswith("tu_"):
-            return "❌ API Key de Groq no configurada. Por favor, configura GROQ_API_KEY en tu archivo .env"
+        # Cliente Groq reutilizado entre llamadas
+        get_groq_client()
         
-        client = Groq(api_key=api_key)
+        # Un prompt idéntico a uno ya respondido no vuelve a llamar a Groq
+        return _cached_completion(_build_prompt(question, context))
         
-        # Construir prompt
-        prompt = f"""Eres un asistente experto en productos tecnológicos. Tu trabajo es responder preguntas basándote ÚNICAMENTE en la información proporcionada.
+    except Exception as e:
+        return _error_message(e)
+
 
-CONTEXTO DE LA BASE DE DATOS:
-{context}
+def _stream_tokens(question: str, context: str) -> Iterator[str]:
+    """
+    Tokens de la respuesta a medida que Groq los produce.
+    
+    A diferencia de generate_rag_response_stream, propaga cualquier error
+    (también los que ocurren a mitad del stream) para que quien consume
+    sepa que la respuesta quedó incompleta.
+    
+    Raises:
+        ValueError: Si la API key no está configurada
+        ImportError: Si la librería groq no está instalada
+    """
+    stream = create_chat_completion(
+        get_groq_client(),
+        messages=_build_messages(_build_prompt(question, context)),
+        model=GROQ_MODEL,
+        temperature=GROQ_TEMPERATURE,
+        seed=GROQ_SEED,
+        max_tokens=GROQ_MAX_TOKENS,
+        stream=True
+    )
+    
+    for chunk in stream:
+        token = chunk.choices[0].delta.content if chunk.choices else None
+        if token:
+            yield token
 
-PREGUNTA DEL USUARIO:
-{question}
 
-INSTRUCCIONES:
-- Responde SOLO con información del contexto proporcionado
-- Si la información no está en el contexto, di "No tengo información suficiente"
-- Sé específico y menciona nombres de productos, precios y características
-- Sé conciso pero completo
-- Responde en español
+def _error_message(e: Exception) -> str:
+    """Mensaje de error mostrado al usuario para un fallo al generar con Groq."""
+    if isinstance(e, ValueError):
+        return "❌ API Key de Groq no configurada. Por favor, configura GROQ_API_KEY en tu archivo .env"
+    if isinstance(e, ImportError):
+        return "❌ Librería 'groq' no instalada. Instala con: pip install groq"
+    return f"❌ Error al generar respuesta con Groq: {str(e)}\n¿Tu API Key es válida?"
 
-RESPUESTA:"""
 
-        print("🤖 Groq está generando la respuesta...")
-        
-        # Llamada a Groq
-        chat_completion = client.chat.completions.create(
-            messages=[
-                {
-                    "role": "user",
-                    "content": prompt
-                }
-            ],
-            model="llama-3.1-8b-instant",
-            temperature=0.3,
-            max_tokens=1000
-        )
+def generate_rag_response_stream(
+    question: str,
+    context: str
+) -> Iterator[str]:
+    """
+    Genera la respuesta RAG en streaming: entrega los tokens a medida que Groq los produce.
+    
+    Args:
+        question: Pregunta del usuario
+        context: Contexto recuperado de la base de datos
         
-        return chat_completion.choices[0].message.content
+    Yields:
+        Fragmentos de texto de la respuesta; si algo falla, un mensaje de error al final
+    """
+    try:
+        yield from _stream_tokens(question, context)
+    except Exception as e:
+        yield _error_message(e)
+
+
+def _print_answer(respuesta: str):
+    """Muestra una respuesta ya completa con el mismo formato que el streaming."""
+    print("\n🤖 Asistente:")
+    print(respuesta)
+
+
+def _generate_answer(question: str, context: str, stream: bool) -> Tuple[str, bool]:
+    """
+    Genera la respuesta RAG; con stream=True la imprime mientras llega.
+    
+    Args:
+        question: Pregunta del usuario
+        context: Contexto recuperado
+        stream: Mostrar los tokens en consola a medida que se generan
         
-    except ImportError:
-        return "❌ Librería 'groq' no instalada. Instala con: pip install groq"
+    Returns:
+        Tupla (respuesta, ok); ok es False si hubo cualquier error, aunque
+        sea después de recibir parte de la respuesta
+    """
+    if not stream:
+        respuesta = generate_rag_response(question, context)
+        return respuesta, not respuesta.startswith("❌")
+    
+    print("\n🤖 Asistente:")
+    partes = []
+    ok = True
+    try:
+        for token in _stream_tokens(question, context):
+            print(token, end="", flush=True)
+            partes.append(token)
     except Exception as e:
-        return f"❌ Error al generar respuesta con Groq: {str(e)}\n¿Tu API Key es válida?"
+        ok = False
+        mensaje = _error_message(e)
+        print(mensaje, end="")
+        partes.append(mensaje)
+    print()
+    return "".join(partes), ok
 
 
 def rag_query_productos(
     question: str,
-    num_results: int = 5
+    num_results: int = 5,
+    stream: bool = False
 ) -> Dict[str, Any]:
     """
     Pipeline RAG completo para preguntas sobre productos.
@@ -142,18 +392,35 @@ def rag_query_productos(
     Args:
         question: Pregunta del usuario
         num_results: Número de productos a recuperar
+        stream: Imprimir la respuesta en consola mientras se genera
         
     Returns:
         Diccionario con contexto, respuesta y fuentes
     """
+    # Paso 0: Preguntas casi idénticas ya respondidas (caché semántica)
+    query_embedding = generate_text_embedding(question)
+    cache = get_semantic_cache()
+    cache_namespace = f"productos:{num_results}"
+    if cache is not None:
+        cached = cache.get(cache_namespace, query_embedding)
+        if cached is not None:
+            print("⚡ Respuesta recuperada de la caché semántica")
+            cached["pregunta"] = question
+            if stream:
+                _print_answer(cached["respuesta"])
+            return cached
+    
     # Paso 1: Búsqueda vectorial (Retrieval)
-    productos = search_productos(question, limit=num_results)
+    productos = search_productos(question, limit=num_results, query_embedding=query_embedding)
     
     if not productos:
+        respuesta = "Lo siento, no encontré productos que coincidan con tu consulta."
+        if stream:
+            _print_answer(respuesta)
         return {
             "pregunta": question,
             "contexto": "No se encontraron productos relevantes.",
-            "respuesta": "Lo siento, no encontré productos que coincidan con tu consulta.",
+            "respuesta": respuesta,
             "fuentes": [],
             "num_fuentes": 0
         }
@@ -162,21 +429,28 @@ def rag_query_productos(
     context = build_context_from_productos(productos)
     
     # Paso 3: Generar respuesta (Generation)
-    respuesta = generate_rag_response(question, context)
+    respuesta, ok = _generate_answer(question, context, stream)
     
-    # Retornar todo
-    return {
+    resultado = {
         "pregunta": question,
         "contexto": context,
         "respuesta": respuesta,
         "fuentes": [p["nombre"] for p in productos],
         "num_fuentes": len(productos)
     }
+    
+    # No se guardan respuestas con error de Groq (ni las cortadas a mitad de stream)
+    if cache is not None and ok:
+        cache.put(cache_namespace, query_embedding, resultado)
+    
+    # Retornar todo
+    return resultado
 
 
 def rag_query_resenas(
     question: str,
-    num_results: int = 5
+    num_results: int = 5,
+    stream: bool = False
 ) -> Dict[str, Any]:
     """
     Pipeline RAG para análisis de reseñas.
@@ -184,18 +458,35 @@ def rag_query_resenas(
     Args:
         question: Pregunta del usuario
         num_results: Número de reseñas a recuperar
+        stream: Imprimir la respuesta en consola mientras se genera
         
     Returns:
         Diccionario con análisis de reseñas
     """
+    # Preguntas casi idénticas ya respondidas (caché semántica)
+    query_embedding = generate_text_embedding(question)
+    cache = get_semantic_cache()
+    cache_namespace = f"resenas:{num_results}"
+    if cache is not None:
+        cached = cache.get(cache_namespace, query_embedding)
+        if cached is not None:
+            print("⚡ Respuesta recuperada de la caché semántica")
+            cached["pregunta"] = question
+            if stream:
+                _print_answer(cached["respuesta"])
+            return cached
+    
     # Retrieval de reseñas
-    resenas = search_resenas(question, limit=num_results)
+    resenas = search_resenas(question, limit=num_results, query_embedding=query_embedding)
     
     if not resenas:
+        respuesta = "No encontré reseñas relacionadas con tu consulta."
+        if stream:
+            _print_answer(respuesta)
         return {
             "pregunta": question,
             "contexto": "No se encontraron reseñas relevantes.",
-            "respuesta": "No encontré reseñas relacionadas con tu consulta.",
+            "respuesta": respuesta,
             "fuentes": [],
             "num_resenas_analizadas": 0
         }
@@ -204,14 +495,19 @@ def rag_query_resenas(
     context = build_context_from_resenas(resenas)
     
     # Generar respuesta
-    respuesta = generate_rag_response(question, context)
+    respuesta, ok = _generate_answer(question, context, stream)
     
-    return {
+    resultado = {
         "pregunta": question,
         "contexto": context,
         "respuesta": respuesta,
         "num_resenas_analizadas": len(resenas)
     }
+    
+    if cache is not None and ok:
+        cache.put(cache_namespace, query_embedding, resultado)
+    
+    return resultado
 
 
 def chat_interactive():
@@ -237,19 +533,21 @@ def chat_interactive():
                 print("\n👋 ¡Hasta luego!")
                 break
             
+            # La respuesta se imprime en streaming mientras Groq la genera
             if question.lower().startswith('/resenas '):
                 query = question.split(' ', 1)[1]
-                result = rag_query_resenas(query, num_results=5)
+                result = rag_query_resenas(query, num_results=5, stream=True)
+                num_fuentes = result["num_resenas_analizadas"]
             elif question.lower().startswith('/productos '):
                 query = question.split(' ', 1)[1]
-                result = rag_query_productos(query, num_results=5)
+                result = rag_query_productos(query, num_results=5, stream=True)
+                num_fuentes = result["num_fuentes"]
             else:
                 # Búsqueda por defecto en productos
-                result = rag_query_productos(question, num_results=5)
+                result = rag_query_productos(question, num_results=5, stream=True)
+                num_fuentes = result["num_fuentes"]
             
-            print(f"\n🤖 Asistente:")
-            print(result["respuesta"])
-            print(f"\n📚 Basado en {result['num_fuentes']} fuentes")
+            print(f"\n📚 Basado en {num_fuentes} fuentes")
             
         except KeyboardInterrupt:
             print("\n\n👋 Chat interrumpido")
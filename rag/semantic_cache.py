@@ -0,0 +1,167 @@
+"""
+Caché semántica de respuestas RAG.
+
+Guarda el resultado de cada consulta RAG junto al embedding de la pregunta.
+Una pregunta nueva cuyo embedding tenga similitud coseno >= umbral con una
+ya respondida reutiliza esa respuesta sin volver a buscar en MongoDB ni
+llamar a Groq. Cada espacio de nombres ("productos:5", "resenas:3"...) tiene
+su propia matriz, así que una consulta de reseñas nunca devuelve una
+respuesta de productos ni una respuesta construida con otro número de
+fuentes.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from config import (
+    TEXT_EMBEDDING_DIM,
+    SEMANTIC_CACHE_ENABLED,
+    SEMANTIC_CACHE_THRESHOLD,
+    SEMANTIC_CACHE_MAX_ENTRIES
+)
+
+
+class _Namespace:
+    """Matriz de embeddings que crece bajo demanda más entradas en orden LRU."""
+
+    # Filas reservadas al crear el espacio de nombres (se duplica al llenarse)
+    INITIAL_ROWS = 64
+
+    def __init__(self, dim: int, max_entries: int):
+        self.max_entries = max_entries
+        self.embeddings = np.zeros((min(self.INITIAL_ROWS, max_entries), dim), dtype=np.float32)
+        # slot -> (clave, resultado); el primero es el menos usado. Los slots
+        # ocupados son siempre 0..len(entries)-1
+        self.entries = OrderedDict()
+
+    def next_slot(self) -> int:
+        """Slot libre para una entrada nueva (desaloja la menos usada si está lleno)."""
+        used = len(self.entries)
+        if used < self.max_entries:
+            if used == len(self.embeddings):
+                rows = min(2 * len(self.embeddings), self.max_entries)
+                grown = np.zeros((rows, self.embeddings.shape[1]), dtype=np.float32)
+                grown[:used] = self.embeddings
+                self.embeddings = grown
+            return used
+        slot, _ = self.entries.popitem(last=False)
+        return slot
+
+
+class SemanticCache:
+    """Caché LRU de respuestas indexada por similitud coseno de la pregunta."""
+
+    # Espacios de nombres simultáneos (se descarta el menos usado al superarlo)
+    MAX_NAMESPACES = 16
+
+    def __init__(
+        self,
+        dim: int = TEXT_EMBEDDING_DIM,
+        max_entries: int = SEMANTIC_CACHE_MAX_ENTRIES,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD
+    ):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self._namespaces = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _normalize(self, embedding: List[float]) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def get(
+        self,
+        namespace: str,
+        embedding: List[float],
+        threshold: Optional[float] = None,
+        key: Any = None
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Busca una respuesta guardada para una pregunta similar.
+
+        Args:
+            namespace: Espacio de nombres (p. ej. "productos:5")
+            embedding: Embedding de la pregunta
+            threshold: Similitud coseno mínima (por defecto la de la caché)
+            key: Clave que debe coincidir exactamente con la usada en put()
+
+        Returns:
+            Copia del resultado guardado, o None si no hay ninguno suficientemente similar
+        """
+        threshold = self.threshold if threshold is None else threshold
+        query = self._normalize(embedding)
+
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None or not ns.entries:
+                return None
+            self._namespaces.move_to_end(namespace)
+
+            # Solo las filas ocupadas; de las que superan el umbral, la más
+            # similar cuya clave coincida
+            scores = ns.embeddings[:len(ns.entries)] @ query
+            candidatos = np.flatnonzero(scores >= threshold)
+            for slot in candidatos[np.argsort(-scores[candidatos])]:
+                slot = int(slot)
+                entry_key, resultado = ns.entries[slot]
+                if entry_key == key:
+                    ns.entries.move_to_end(slot)
+                    return dict(resultado)
+            return None
+
+    def put(self, namespace: str, embedding: List[float], resultado: Dict[str, Any], key: Any = None):
+        """
+        Guarda el resultado de una pregunta, desalojando la entrada menos usada si está llena.
+
+        Args:
+            namespace: Espacio de nombres (p. ej. "productos:5")
+            embedding: Embedding de la pregunta
+            resultado: Diccionario devuelto por el pipeline RAG
+            key: Clave adicional exigida en get() (p. ej. el contexto usado)
+        """
+        vector = self._normalize(embedding)
+
+        with self._lock:
+            ns = self._namespaces.get(namespace)
+            if ns is None:
+                if len(self._namespaces) >= self.MAX_NAMESPACES:
+                    self._namespaces.popitem(last=False)
+                ns = self._namespaces[namespace] = _Namespace(self.dim, self.max_entries)
+            self._namespaces.move_to_end(namespace)
+
+            slot = ns.next_slot()
+            ns.embeddings[slot] = vector
+            ns.entries[slot] = (key, dict(resultado))
+
+    def clear(self):
+        """Descarta todas las respuestas guardadas (p. ej. tras recargar los datos)."""
+        with self._lock:
+            self._namespaces.clear()
+
+
+# Singleton de la caché semántica (None si está deshabilitada)
+_semantic_cache = None
+
+
+def get_semantic_cache() -> Optional[SemanticCache]:
+    """
+    Obtiene la caché semántica de respuestas (singleton).
+
+    Returns:
+        SemanticCache, o None si RAG_SEMANTIC_CACHE=0
+    """
+    global _semantic_cache
+    if _semantic_cache is None and SEMANTIC_CACHE_ENABLED:
+        _semantic_cache = SemanticCache()
+    return _semantic_cache
+
+
+def clear_semantic_cache():
+    """Vacía la caché semántica si ya se creó en este proceso."""
+    if _semantic_cache is not None:
+        _semantic_cache.clear()
@@ -4,49 +4,387 @@ Cumple con los requerimientos del proyecto final.
 """
 
 import os
-import openai
-from typing import List, Dict, Any
-import json
+import asyncio
+import importlib.util
+import random
+import time
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, AsyncIterator, Tuple
+
+import numpy as np
+
+# Se añade al final de un streaming que falla tras haber enviado parte de la respuesta
+_STREAM_ERROR_MARKER = "\n\n❌ Respuesta interrumpida por un error del LLM."
+
+# Instrucciones fijas del asistente. Van siempre en el mensaje system con el
+# mismo texto, así el proveedor puede reutilizar su caché de prefijo.
+SYSTEM_PROMPT = """Eres un asistente experto en productos tecnológicos. Tu trabajo es responder preguntas basándote ÚNICAMENTE en la información proporcionada en el contexto.
+
+INSTRUCCIONES:
+1. Responde basándote SOLO en la información del contexto
+2. Si la información es insuficiente, menciona qué datos específicos faltan
+3. Incluye referencias específicas a productos, precios y características
+4. Menciona las fuentes de información (nombres de productos, reseñas)
+5. Si hay múltiples opciones, compáralas objetivamente
+6. Usa un tono profesional pero amigable
+7. Si no hay información relevante en el contexto, dilo claramente"""
+
+# Peticiones simultáneas máximas al LLM en generate_batch
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "8"))
+
+# Reintentos ante límites de tasa / errores transitorios (backoff exponencial con jitter)
+LLM_MAX_ATTEMPTS = 4
+LLM_BACKOFF_MIN = 1.0
+LLM_BACKOFF_MAX = 20.0
+
+# Errores transitorios de los SDK (groq, openai, huggingface_hub), por nombre
+# para no tener que importar SDKs de proveedores que no se usan
+_RETRYABLE_ERRORS = (
+    "RateLimitError",
+    "APIConnectionError",
+    "APITimeoutError",
+    "InternalServerError",
+    "ServiceUnavailableError",
+    "Timeout"
+)
+_RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+
+# Conexiones keep-alive hacia el proveedor (TLS reutilizado entre llamadas)
+LLM_MAX_CONNECTIONS = 32
+LLM_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# Presupuesto del contexto (caracteres como aproximación a tokens)
+DESC_MAX_CHARS = 400
+CONTEXT_MAX_CHARS = 6000
+
+_PRODUCTO_TMPL = (
+    "{i}. {nombre}\n"
+    "   - Marca: {marca}\n"
+    "   - Categoría: {categoria}\n"
+    "   - Precio: ${precio}\n"
+    "   - Descripción: {descripcion}\n"
+    "   - Calificación: {calificacion}/5\n"
+    "   - Disponibilidad: {disponibilidad}\n"
+    "   - Similitud: {similitud:.2%}"
+)
+
+_RESENA_TMPL = (
+    '{i}. "{titulo}"\n'
+    "   - Usuario: {usuario}\n"
+    "   - Calificación: {calificacion}/5\n"
+    "   - Contenido: {contenido}\n"
+    "   - Compra verificada: {verificada}\n"
+    "   - Similitud: {similitud:.2%}"
+)
+
+
+def _top_k(items: List[Dict], k: int) -> List[Dict]:
+    """
+    Retorna los k elementos con mayor 'similarity', ordenados de mayor a menor.
+
+    Usa np.argpartition (O(n)) y solo ordena los k seleccionados; con k o
+    menos elementos se ordenan todos.
+    """
+    if not items or k <= 0:
+        return []
+    sims = np.fromiter((item.get('similarity', 0) for item in items), dtype=np.float32, count=len(items))
+    idx = np.argpartition(-sims, k - 1)[:k] if len(items) > k else np.arange(len(items))
+    return [items[i] for i in idx[np.argsort(-sims[idx], kind="stable")]]
+
+
+def _clip(text, max_chars: int = DESC_MAX_CHARS):
+    """Recorta un texto largo a max_chars caracteres, marcando el corte con '…'."""
+    if isinstance(text, str) and len(text) > max_chars:
+        return text[:max_chars] + "…"
+    return text
+
+
+def _fmt_producto(i: int, product: Dict) -> str:
+    """Formatea un producto para el contexto del prompt."""
+    get = product.get
+    return _PRODUCTO_TMPL.format(
+        i=i,
+        nombre=get('nombre', 'Producto sin nombre'),
+        marca=(get('marca') or {}).get('nombre', 'N/A'),
+        categoria=(get('categoria') or {}).get('nombre', 'N/A'),
+        precio=get('precio_usd', 'N/A'),
+        descripcion=_clip(get('descripcion', 'Sin descripción')),
+        calificacion=get('calificacion', 'N/A'),
+        disponibilidad=get('disponibilidad', 'N/A'),
+        similitud=get('similarity', 0)
+    )
+
+
+def _fmt_resena(i: int, review: Dict) -> str:
+    """Formatea una reseña para el contexto del prompt."""
+    get = review.get
+    return _RESENA_TMPL.format(
+        i=i,
+        titulo=get('titulo', 'Sin título'),
+        usuario=get('usuario', 'Anónimo'),
+        calificacion=get('calificacion', 'N/A'),
+        contenido=_clip(get('contenido', 'Sin contenido')),
+        verificada='Sí' if get('compra_verificada', False) else 'No',
+        similitud=get('similarity', 0)
+    )
+
+
+def _context_key(products: List[Dict], reviews: List[Dict]) -> Tuple:
+    """
+    Identifica el contexto recuperado por los ids de sus productos y reseñas.
+
+    Se usa como clave de la caché semántica: una respuesta solo se reutiliza
+    si se generó a partir de los mismos documentos. Sin id se usa el nombre
+    o título, que es lo que aparece en el prompt.
+    """
+    def doc_id(doc, campos):
+        for campo in campos:
+            valor = doc.get(campo)
+            if valor is not None:
+                return str(valor)
+        return ""
+
+    return (
+        tuple(sorted(doc_id(p, ('id', 'idProducto', 'codigoProducto', 'codigo', '_id', 'nombre')) for p in products)),
+        tuple(sorted(doc_id(r, ('id', 'idResena', '_id', 'titulo')) for r in reviews))
+    )
+
+
+@lru_cache(maxsize=None)
+def _env_present(name: str) -> bool:
+    """
+    Indica si la variable de entorno está definida.
+
+    Se consulta una sola vez por nombre: el cliente también se configura una
+    única vez al crear el integrador, así que el resultado no cambia después.
+    """
+    return os.getenv(name) is not None
+
+
+def _http_limits():
+    """Límites del pool de conexiones HTTP compartido por los clientes del LLM."""
+    import httpx
+    return httpx.Limits(
+        max_connections=LLM_MAX_CONNECTIONS,
+        max_keepalive_connections=LLM_MAX_CONNECTIONS
+    )
+
+
+def _new_async_groq(api_key: str):
+    """Crea un cliente AsyncGroq con su propio pool de conexiones keep-alive."""
+    import httpx
+    from groq import AsyncGroq
+    return AsyncGroq(
+        api_key=api_key,
+        max_retries=0,
+        http_client=httpx.AsyncClient(
+            http2=LLM_HTTP2,
+            limits=_http_limits(),
+            timeout=httpx.Timeout(60.0, connect=10.0)
+        )
+    )
+
+
+def _retry_delay(exc: Exception, intento: int):
+    """
+    Segundos a esperar antes de reintentar, o None si el error no es transitorio.
+
+    Backoff exponencial (1s, 2s, 4s... hasta LLM_BACKOFF_MAX) con jitter;
+    respeta la cabecera retry-after cuando el proveedor la envía.
+    """
+    response = getattr(exc, "response", None)
+    status = getattr(exc, "status_code", None) or getattr(response, "status_code", None)
+    if type(exc).__name__ not in _RETRYABLE_ERRORS and status not in _RETRYABLE_STATUS:
+        return None
+
+    espera = min(LLM_BACKOFF_MAX, LLM_BACKOFF_MIN * 2 ** (intento - 1))
+    headers = getattr(response, "headers", None)
+    retry_after = headers.get("retry-after") if headers is not None else None
+    try:
+        return max(espera, float(retry_after))
+    except (TypeError, ValueError):
+        return espera + random.uniform(0, espera / 2)
+
+
+def _call_with_retry(fn, *args):
+    """Llama a fn(*args) reintentando ante errores transitorios del proveedor."""
+    for intento in range(1, LLM_MAX_ATTEMPTS + 1):
+        try:
+            return fn(*args)
+        except Exception as e:
+            espera = _retry_delay(e, intento)
+            if espera is None or intento == LLM_MAX_ATTEMPTS:
+                raise
+            print(f"⚠ LLM no disponible ({type(e).__name__}), reintento {intento}/{LLM_MAX_ATTEMPTS - 1} en {espera:.1f}s")
+            time.sleep(espera)
+
+
+async def _acall_with_retry(fn, *args):
+    """Versión asíncrona de _call_with_retry (fn es una corrutina)."""
+    for intento in range(1, LLM_MAX_ATTEMPTS + 1):
+        try:
+            return await fn(*args)
+        except Exception as e:
+            espera = _retry_delay(e, intento)
+            if espera is None or intento == LLM_MAX_ATTEMPTS:
+                raise
+            print(f"⚠ LLM no disponible ({type(e).__name__}), reintento {intento}/{LLM_MAX_ATTEMPTS - 1} en {espera:.1f}s")
+            await asyncio.sleep(espera)
+
+
+def _estimate_tokens(prompt: str, text: str) -> int:
+    """Estimación aproximada de tokens (palabras) cuando el proveedor no informa el uso."""
+    return len(prompt.split()) + len(text.split())
+
+
+def _text_and_usage(prompt: str, response) -> Tuple[str, int]:
+    """
+    Extrae el texto y los tokens consumidos de una respuesta de chat.
+
+    Usa response.usage.total_tokens (Groq y OpenAI lo devuelven ya contado);
+    solo si falta se recurre a la estimación por palabras.
+    """
+    text = response.choices[0].message.content
+    usage = getattr(response, "usage", None)
+    if usage is not None and getattr(usage, "total_tokens", None) is not None:
+        return text, usage.total_tokens
+    return text, _estimate_tokens(prompt, text)
+
+
+def _coalesce_tokens(tokens: Iterator[str], growth: int = 1, max_batch: int = 64) -> Iterator[str]:
+    """
+    Agrupa los fragmentos de un stream en bloques de tamaño creciente (1, g, g², ...).
+
+    El primer fragmento sale solo (no retrasa el primer token) y los
+    siguientes se agrupan para reducir el número de escrituras al cliente.
+
+    Args:
+        tokens: Iterador de fragmentos de texto
+        growth: Factor de crecimiento del bloque (1 = sin agrupar)
+        max_batch: Tamaño máximo de bloque
+
+    Returns:
+        Iterador de bloques de texto
+    """
+    if growth <= 1:
+        yield from tokens
+        return
+
+    batch_size = 1
+    buffer = []
+    for token in tokens:
+        buffer.append(token)
+        if len(buffer) >= batch_size:
+            yield "".join(buffer)
+            buffer = []
+            batch_size = min(batch_size * growth, max_batch)
+    if buffer:
+        yield "".join(buffer)
+
 
 class RAGLLMIntegrator:
     """
     Integrador de LLM para sistema RAG.
     Soporta múltiples proveedores: Groq, HuggingFace, OpenAI.
     """
+
+    # proveedor -> (configuración, generación, streaming, variable de la API key)
+    _PROVIDERS = {
+        "groq": ("_setup_groq", "_generate_groq_response", "_stream_groq_response", "GROQ_API_KEY"),
+        "openai": ("_setup_openai", "_generate_openai_response", "_stream_openai_response", "OPENAI_API_KEY"),
+        "huggingface": ("_setup_huggingface", "_generate_hf_response", "_stream_hf_response", "HF_API_KEY"),
+    }
     
-    def __init__(self, provider="groq", model="llama-3.1-8b-instant"):
+    def __init__(self, provider="groq", model="llama-3.1-8b-instant", semantic_cache=False):
         self.provider = provider.lower()
         self.model = model
         self.client = None
+        self.aclient = None  # Cliente asíncrono (solo Groq) para generate_batch
+        self.semantic_cache = None
         self._setup_client()
+
+        if semantic_cache:
+            # Opcional: requiere sentence-transformers para embeber la pregunta
+            from rag.semantic_cache import get_semantic_cache
+            self.semantic_cache = get_semantic_cache()
     
     def _setup_client(self):
         """Configura el cliente según el proveedor seleccionado."""
-        if self.provider == "groq":
-            # Groq API (recomendado en el documento)
-            try:
-                from groq import Groq
-                api_key = os.getenv("GROQ_API_KEY", "gsk_demo_key_for_testing")
-                self.client = Groq(api_key=api_key)
-                print("✅ Cliente Groq configurado")
-            except ImportError:
-                print("❌ Groq no disponible, usando OpenAI como fallback")
-                self._setup_openai()
-        
-        elif self.provider == "openai":
-            self._setup_openai()
-        
-        elif self.provider == "huggingface":
-            self._setup_huggingface()
-        
-        else:
+        if self.provider not in self._PROVIDERS:
             print(f"⚠️  Proveedor {self.provider} no reconocido, usando modo demo")
+            self._gen_fn = self._stream_fn = self._env = None
             self.client = None
+            return
+
+        self._use_provider(self.provider)
+        getattr(self, self._PROVIDERS[self.provider][0])()
+
+    def _use_provider(self, provider: str):
+        """Resuelve una sola vez las funciones de generación del proveedor."""
+        _, gen_name, stream_name, self._env = self._PROVIDERS[provider]
+        self._gen_fn = getattr(self, gen_name)
+        self._stream_fn = getattr(self, stream_name)
+
+    def _setup_groq(self):
+        """Configurar Groq (recomendado en el documento)."""
+        try:
+            import httpx
+            from groq import Groq
+            api_key = os.getenv("GROQ_API_KEY", "gsk_demo_key_for_testing")
+            # Pool de conexiones keep-alive; HTTP/2 solo si el paquete h2 está instalado
+            self.client = Groq(
+                api_key=api_key,
+                max_retries=0,
+                http_client=httpx.Client(
+                    http2=LLM_HTTP2,
+                    limits=_http_limits(),
+                    timeout=httpx.Timeout(60.0, connect=10.0)
+                )
+            )
+            self.aclient = _new_async_groq(api_key)
+            print("✅ Cliente Groq configurado")
+        except ImportError:
+            print("❌ Groq no disponible, usando OpenAI como fallback")
+            self._use_provider("openai")
+            self._setup_openai()
     
+    def _cache_lookup(self, query: str, context_key: Tuple):
+        """
+        Busca en la caché semántica una respuesta a una pregunta similar.
+
+        Solo se reutilizan respuestas generadas con el mismo contexto
+        (mismos productos y reseñas), ver _context_key.
+
+        Returns:
+            Tupla (embedding de la pregunta, respuesta guardada o None)
+        """
+        if self.semantic_cache is None:
+            return None, None
+
+        from search.vector_search import generate_text_embedding
+        embedding = generate_text_embedding(query)
+        cached = self.semantic_cache.get(f"llm:{self.provider}:{self.model}", embedding, key=context_key)
+        if cached is not None:
+            cached["status"] = "cache_hit"
+            cached["processing_time"] = 0
+        return embedding, cached
+
+    def _cache_store(self, embedding, context_key: Tuple, result: Dict[str, Any]):
+        """Guarda una respuesta generada por el LLM en la caché semántica."""
+        if self.semantic_cache is not None and embedding is not None:
+            self.semantic_cache.put(f"llm:{self.provider}:{self.model}", embedding, result, key=context_key)
+
     def _setup_openai(self):
         """Configurar OpenAI (Free tier)."""
         api_key = os.getenv("OPENAI_API_KEY", "demo_key")
         if api_key != "demo_key":
+            try:
+                # Import diferido: el SDK solo se carga si se usa este proveedor
+                import openai
+            except ImportError:
+                print("❌ OpenAI no disponible")
+                self.client = None
+                return
             openai.api_key = api_key
             self.client = openai
             self.model = "gpt-3.5-turbo"
@@ -82,6 +420,21 @@ class RAGLLMIntegrator:
         # Extraer productos y reseñas del contexto
         context_products = context.get('productos', [])
         context_reviews = context.get('resenas', [])
+
+        # Modo demo sin API: no hace falta caché, contexto ni prompt
+        if self.client is None:
+            return {
+                "response": self._generate_demo_response(query, context_products, context_reviews),
+                "tokens_used": 0,
+                "processing_time": 0.5,
+                "status": "success"
+            }
+
+        # Pregunta casi idéntica ya respondida con este contexto: se evita la llamada al LLM
+        context_key = _context_key(context_products, context_reviews)
+        query_embedding, cached = self._cache_lookup(query, context_key)
+        if cached is not None:
+            return cached
         
         # Preparar contexto
         context_text = self._prepare_context(context_products, context_reviews)
@@ -90,36 +443,23 @@ class RAGLLMIntegrator:
         prompt = self._create_rag_prompt(query, context_text)
         
         # Generar respuesta
-        if self.client is None:
-            # Modo demo sin API
+        start_time = time.perf_counter()
+        
+        try:
+            response_text, tokens_used = _call_with_retry(self._gen_fn, prompt)
+            
+            processing_time = time.perf_counter() - start_time
+            self._cache_store(query_embedding, context_key, {
+                "response": response_text,
+                "tokens_used": tokens_used,
+                "status": "success"
+            })
+            
+        except Exception as e:
+            print(f"❌ Error generando respuesta: {e}")
             response_text = self._generate_demo_response(query, context_products, context_reviews)
             tokens_used = 0
-            processing_time = 0.5
-        else:
-            import time
-            start_time = time.time()
-            
-            try:
-                if self.provider == "groq":
-                    response_text = self._generate_groq_response(prompt)
-                    tokens_used = len(prompt.split()) + len(response_text.split())  # Estimación
-                elif self.provider == "openai":
-                    response_text = self._generate_openai_response(prompt)
-                    tokens_used = len(prompt.split()) + len(response_text.split())  # Estimación
-                elif self.provider == "huggingface":
-                    response_text = self._generate_hf_response(prompt)
-                    tokens_used = len(prompt.split()) + len(response_text.split())  # Estimación
-                else:
-                    response_text = self._generate_demo_response(query, context_products, context_reviews)
-                    tokens_used = 0
-                
-                processing_time = time.time() - start_time
-                
-            except Exception as e:
-                print(f"❌ Error generando respuesta: {e}")
-                response_text = self._generate_demo_response(query, context_products, context_reviews)
-                tokens_used = 0
-                processing_time = time.time() - start_time
+            processing_time = time.perf_counter() - start_time
         
         return {
             "response": response_text,
@@ -128,106 +468,356 @@ class RAGLLMIntegrator:
             "status": "success"
         }
 
+    def stream_rag_response(
+        self,
+        query: str,
+        context: Dict[str, Any],
+        batch_growth: int = 1
+    ) -> Iterator[str]:
+        """
+        Genera la respuesta RAG en streaming, fragmento a fragmento.
+
+        Args:
+            query: Pregunta del usuario
+            context: Diccionario con productos y reseñas relevantes
+            batch_growth: Factor de agrupación de fragmentos (1 = un fragmento por yield)
+
+        Returns:
+            Iterador de fragmentos de texto de la respuesta
+        """
+        context_products = context.get('productos', [])
+        context_reviews = context.get('resenas', [])
+
+        if self.client is None:
+            yield self._generate_demo_response(query, context_products, context_reviews)
+            return
+
+        context_text = self._prepare_context(context_products, context_reviews)
+        prompt = self._create_rag_prompt(query, context_text)
+
+        emitido = False
+        try:
+            tokens = self._stream_fn(prompt)
+            for fragmento in _coalesce_tokens(tokens, batch_growth):
+                emitido = True
+                yield fragmento
+        except Exception as e:
+            print(f"❌ Error generando respuesta: {e}")
+            # Con parte de la respuesta ya enviada no se mezcla la respuesta demo
+            if emitido:
+                yield _STREAM_ERROR_MARKER
+            else:
+                yield self._generate_demo_response(query, context_products, context_reviews)
+
+    async def astream_rag_response(self, query: str, context: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Versión asíncrona de stream_rag_response (cliente AsyncGroq).
+
+        Args:
+            query: Pregunta del usuario
+            context: Diccionario con productos y reseñas relevantes
+
+        Returns:
+            Iterador asíncrono de fragmentos de texto de la respuesta
+        """
+        if self.aclient is None:
+            for fragmento in self.stream_rag_response(query, context):
+                yield fragmento
+            return
+
+        context_products = context.get('productos', [])
+        context_reviews = context.get('resenas', [])
+        context_text = self._prepare_context(context_products, context_reviews)
+        prompt = self._create_rag_prompt(query, context_text)
+
+        emitido = False
+        try:
+            stream = await self.aclient.chat.completions.create(
+                model=self.model,
+                messages=self._build_messages(prompt),
+                temperature=0.7,
+                max_tokens=800,
+                stream=True
+            )
+            async for chunk in stream:
+                token = chunk.choices[0].delta.content
+                if token:
+                    emitido = True
+                    yield token
+        except Exception as e:
+            print(f"❌ Error generando respuesta: {e}")
+            if emitido:
+                yield _STREAM_ERROR_MARKER
+            else:
+                yield self._generate_demo_response(query, context_products, context_reviews)
+
+    async def agenerate_rag_response(self, query: str, context: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Versión asíncrona de generate_rag_response.
+
+        Con Groq usa el cliente AsyncGroq, de modo que varias consultas pueden
+        esperar la red a la vez. OpenAI y HuggingFace no tienen cliente
+        asíncrono aquí: su llamada síncrona se ejecuta en un hilo
+        (asyncio.to_thread) para que también se solapen. En modo demo delega
+        directamente en la versión síncrona.
+
+        Args:
+            query: Pregunta del usuario
+            context: Diccionario con productos y reseñas relevantes
+
+        Returns:
+            Dict con respuesta generada y metadatos (mismo formato que generate_rag_response)
+        """
+        if self.client is None:
+            return self.generate_rag_response(query, context)
+        if self.aclient is None:
+            return await asyncio.to_thread(self.generate_rag_response, query, context)
+
+        context_products = context.get('productos', [])
+        context_reviews = context.get('resenas', [])
+        context_key = _context_key(context_products, context_reviews)
+        query_embedding, cached = self._cache_lookup(query, context_key)
+        if cached is not None:
+            return cached
+
+        context_text = self._prepare_context(context_products, context_reviews)
+        prompt = self._create_rag_prompt(query, context_text)
+
+        start_time = time.perf_counter()
+        try:
+            response_text, tokens_used = await _acall_with_retry(self._agenerate_groq_response, prompt)
+            self._cache_store(query_embedding, context_key, {
+                "response": response_text,
+                "tokens_used": tokens_used,
+                "status": "success"
+            })
+        except Exception as e:
+            print(f"❌ Error generando respuesta: {e}")
+            response_text = self._generate_demo_response(query, context_products, context_reviews)
+            tokens_used = 0
+
+        return {
+            "response": response_text,
+            "tokens_used": tokens_used,
+            "processing_time": time.perf_counter() - start_time,
+            "status": "success"
+        }
+
+    async def agenerate_batch(
+        self,
+        queries: List[str],
+        contexts: List[Dict[str, Any]],
+        max_concurrency: int = LLM_MAX_CONCURRENCY
+    ) -> List[Dict[str, Any]]:
+        """
+        Genera respuestas RAG para varias consultas de forma concurrente.
+
+        Args:
+            queries: Preguntas de los usuarios
+            contexts: Contexto recuperado para cada pregunta (mismo orden)
+            max_concurrency: Máximo de peticiones simultáneas al LLM (límite de tasa;
+                también acota los hilos usados por OpenAI/HuggingFace)
+
+        Returns:
+            Lista de respuestas en el mismo orden que las preguntas
+        """
+        semaphore = asyncio.Semaphore(max(1, max_concurrency))
+
+        async def _una(query, context):
+            async with semaphore:
+                return await self.agenerate_rag_response(query, context)
+
+        resultados = await asyncio.gather(
+            *(_una(q, ctx) for q, ctx in zip(queries, contexts)),
+            return_exceptions=True
+        )
+
+        return [
+            {
+                "response": f"❌ Error generando respuesta: {r}",
+                "tokens_used": 0,
+                "processing_time": 0,
+                "status": "error"
+            } if isinstance(r, Exception) else r
+            for r in resultados
+        ]
+
+    def generate_batch(
+        self,
+        queries: List[str],
+        contexts: List[Dict[str, Any]],
+        max_concurrency: int = LLM_MAX_CONCURRENCY
+    ) -> List[Dict[str, Any]]:
+        """
+        Envoltorio síncrono de agenerate_batch (usa asyncio.run).
+
+        Desde código que ya corre dentro de un event loop, usar agenerate_batch.
+
+        Args:
+            queries: Preguntas de los usuarios
+            contexts: Contexto recuperado para cada pregunta (mismo orden)
+            max_concurrency: Máximo de peticiones simultáneas al LLM
+
+        Returns:
+            Lista de respuestas en el mismo orden que las preguntas
+        """
+        async def _run():
+            try:
+                return await self.agenerate_batch(queries, contexts, max_concurrency)
+            finally:
+                await self._reset_async_client()
+
+        return asyncio.run(_run())
+
+    async def _reset_async_client(self):
+        """
+        Cierra el cliente asíncrono y crea uno nuevo.
+
+        Las conexiones de httpx quedan ligadas al event loop de asyncio.run,
+        que se cierra al terminar; la siguiente llamada necesita un cliente limpio.
+        """
+        if self.aclient is None:
+            return
+        await self.aclient.close()
+        self.aclient = _new_async_groq(self.aclient.api_key)
+
     def _prepare_context(self, products: List[Dict], reviews: List[Dict] = None) -> str:
-        """Prepara el contexto para el prompt RAG."""
+        """
+        Prepara el contexto para el prompt RAG.
+
+        Toma hasta 5 productos y 3 reseñas, recorta los textos largos y deja
+        de añadir bloques cuando el contexto supera CONTEXT_MAX_CHARS.
+        """
         context_parts = []
-        
-        # Contexto de productos
+        bloques = []
         if products:
-            context_parts.append("=== PRODUCTOS RELEVANTES ===")
-            for i, product in enumerate(products[:5], 1):  # Top 5 productos
-                context_parts.append(f"""
-{i}. {product.get('nombre', 'Producto sin nombre')}
-   - Marca: {product.get('marca', {}).get('nombre', 'N/A')}
-   - Categoría: {product.get('categoria', {}).get('nombre', 'N/A')}
-   - Precio: ${product.get('precio_usd', 'N/A')}
-   - Descripción: {product.get('descripcion', 'Sin descripción')}
-   - Calificación: {product.get('calificacion', 'N/A')}/5
-   - Disponibilidad: {product.get('disponibilidad', 'N/A')}
-   - Similitud: {product.get('similarity', 0):.2%}
-                """.strip())
-        
-        # Contexto de reseñas
+            bloques.append(("=== PRODUCTOS RELEVANTES ===",
+                            [_fmt_producto(i, p) for i, p in enumerate(_top_k(products, 5), 1)]))
         if reviews:
-            context_parts.append("\n=== RESEÑAS RELEVANTES ===")
-            for i, review in enumerate(reviews[:3], 1):  # Top 3 reseñas
-                context_parts.append(f"""
-{i}. "{review.get('titulo', 'Sin título')}"
-   - Usuario: {review.get('usuario', 'Anónimo')}
-   - Calificación: {review.get('calificacion', 'N/A')}/5
-   - Contenido: {review.get('contenido', 'Sin contenido')}
-   - Compra verificada: {'Sí' if review.get('compra_verificada', False) else 'No'}
-   - Similitud: {review.get('similarity', 0):.2%}
-                """.strip())
+            bloques.append(("\n=== RESEÑAS RELEVANTES ===",
+                            [_fmt_resena(i, r) for i, r in enumerate(_top_k(reviews, 3), 1)]))
+
+        total_len = 0
+        omitidos = 0
+        for cabecera, items in bloques:
+            if total_len + len(cabecera) > CONTEXT_MAX_CHARS:
+                omitidos += len(items)
+                continue
+            context_parts.append(cabecera)
+            total_len += len(cabecera) + 1
+            for n, item in enumerate(items):
+                if total_len + len(item) > CONTEXT_MAX_CHARS:
+                    omitidos += len(items) - n
+                    break
+                context_parts.append(item)
+                total_len += len(item) + 1
+
+        if omitidos:
+            print(f"⚠ Contexto recortado a {CONTEXT_MAX_CHARS} caracteres ({omitidos} elementos omitidos)")
         
         return "\n".join(context_parts)
 
     def _create_rag_prompt(self, query: str, context: str) -> str:
-        """Crea el prompt RAG optimizado."""
-        return f"""
-Eres un asistente experto en productos tecnológicos. Tu trabajo es responder preguntas basándote ÚNICAMENTE en la información proporcionada en el contexto.
-
-CONTEXTO DE LA BASE DE DATOS:
-{context}
-
-PREGUNTA DEL USUARIO: {query}
+        """Crea la parte variable del prompt RAG (contexto + pregunta)."""
+        return f"CONTEXTO DE LA BASE DE DATOS:\n{context}\n\nPREGUNTA DEL USUARIO: {query}\n\nRESPUESTA:"
 
-INSTRUCCIONES:
-1. Responde basándote SOLO en la información del contexto
-2. Si la información es insuficiente, menciona qué datos específicos faltan
-3. Incluye referencias específicas a productos, precios y características
-4. Menciona las fuentes de información (nombres de productos, reseñas)
-5. Si hay múltiples opciones, compáralas objetivamente
-6. Usa un tono profesional pero amigable
-7. Si no hay información relevante en el contexto, dilo claramente
-
-RESPUESTA:
-        """.strip()
+    def _build_messages(self, prompt: str) -> List[Dict[str, str]]:
+        """Mensajes de chat: instrucciones fijas como system y el prompt RAG como user."""
+        return [
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ]
 
-    def _generate_groq_response(self, prompt: str) -> str:
+    def _generate_groq_response(self, prompt: str) -> Tuple[str, int]:
         """Genera respuesta usando Groq API."""
         try:
             response = self.client.chat.completions.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": "Eres un asistente experto en productos tecnológicos."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._build_messages(prompt),
+                temperature=0.7,
+                max_tokens=800
+            )
+            return _text_and_usage(prompt, response)
+        except Exception as e:
+            print(f"Error con Groq API: {e}")
+            raise
+
+    async def _agenerate_groq_response(self, prompt: str) -> Tuple[str, int]:
+        """Genera respuesta usando el cliente asíncrono de Groq."""
+        try:
+            response = await self.aclient.chat.completions.create(
+                model=self.model,
+                messages=self._build_messages(prompt),
                 temperature=0.7,
                 max_tokens=800
             )
-            return response.choices[0].message.content
+            return _text_and_usage(prompt, response)
         except Exception as e:
             print(f"Error con Groq API: {e}")
             raise
 
-    def _generate_openai_response(self, prompt: str) -> str:
+    def _stream_groq_response(self, prompt: str) -> Iterator[str]:
+        """Genera respuesta en streaming usando Groq API."""
+        stream = self.client.chat.completions.create(
+            model=self.model,
+            messages=self._build_messages(prompt),
+            temperature=0.7,
+            max_tokens=800,
+            stream=True
+        )
+        for chunk in stream:
+            token = chunk.choices[0].delta.content
+            if token:
+                yield token
+
+    def _stream_openai_response(self, prompt: str) -> Iterator[str]:
+        """Genera respuesta en streaming usando OpenAI API."""
+        stream = self.client.ChatCompletion.create(
+            model=self.model,
+            messages=self._build_messages(prompt),
+            temperature=0.7,
+            max_tokens=800,
+            stream=True
+        )
+        for chunk in stream:
+            token = chunk.choices[0].delta.get("content")
+            if token:
+                yield token
+
+    def _stream_hf_response(self, prompt: str) -> Iterator[str]:
+        """Genera respuesta en streaming usando HuggingFace Inference API."""
+        yield from self.client.text_generation(
+            prompt=f"{SYSTEM_PROMPT}\n\n{prompt}",
+            max_new_tokens=800,
+            temperature=0.7,
+            do_sample=True,
+            stream=True
+        )
+
+    def _generate_openai_response(self, prompt: str) -> Tuple[str, int]:
         """Genera respuesta usando OpenAI API."""
         try:
-            response = openai.ChatCompletion.create(
+            response = self.client.ChatCompletion.create(
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": "Eres un asistente experto en productos tecnológicos."},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=self._build_messages(prompt),
                 temperature=0.7,
                 max_tokens=800
             )
-            return response.choices[0].message.content
+            return _text_and_usage(prompt, response)
         except Exception as e:
             print(f"Error con OpenAI API: {e}")
             raise
 
-    def _generate_hf_response(self, prompt: str) -> str:
+    def _generate_hf_response(self, prompt: str) -> Tuple[str, int]:
         """Genera respuesta usando HuggingFace Inference API."""
         try:
             response = self.client.text_generation(
-                prompt=prompt,
+                prompt=f"{SYSTEM_PROMPT}\n\n{prompt}",
                 max_new_tokens=800,
                 temperature=0.7,
                 do_sample=True
             )
-            return response
+            return response, _estimate_tokens(prompt, response)
         except Exception as e:
             print(f"Error con HuggingFace API: {e}")
             raise
@@ -259,7 +849,7 @@ Para obtener respuestas generadas por IA, configura una de las siguientes APIs:
         ]
         
         # Top 3 productos
-        for i, product in enumerate(products[:3], 1):
+        for i, product in enumerate(_top_k(products, 3), 1):
             match_percent = int(product.get('similarity', 0) * 100)
             response_parts.append(f"""
 **{i}. {product.get('nombre', 'Producto')}** ({match_percent}% relevancia)
@@ -286,7 +876,7 @@ export GROQ_API_KEY="tu_api_key_aqui"
         sources = []
         
         # Fuentes de productos
-        for product in products[:5]:
+        for product in _top_k(products, 5):
             sources.append({
                 "type": "product",
                 "id": product.get('id'),
@@ -297,7 +887,7 @@ export GROQ_API_KEY="tu_api_key_aqui"
         
         # Fuentes de reseñas
         if reviews:
-            for review in reviews[:3]:
+            for review in _top_k(reviews, 3):
                 sources.append({
                     "type": "review",
                     "title": review.get('titulo'),
@@ -315,15 +905,13 @@ export GROQ_API_KEY="tu_api_key_aqui"
             "model": self.model,
             "client_available": self.client is not None,
             "api_key_configured": self._check_api_key(),
+            "http_pool": {
+                "max_connections": LLM_MAX_CONNECTIONS,
+                "http2": LLM_HTTP2
+            } if self.aclient is not None else None,
             "status": "ready" if self.client is not None else "demo_mode"
         }
     
     def _check_api_key(self) -> bool:
         """Verifica si hay API key configurada."""
-        if self.provider == "groq":
-            return os.getenv("GROQ_API_KEY") is not None
-        elif self.provider == "openai":
-            return os.getenv("OPENAI_API_KEY") is not None
-        elif self.provider == "huggingface":
-            return os.getenv("HF_API_KEY") is not None
-        return False
\ No newline at end of file
+        return self._env is not None and _env_present(self._env)
@@ -2,177 +2,276 @@
 Script para crear índices en las colecciones de MongoDB.
 """
 
-from pymongo import ASCENDING, DESCENDING, TEXT
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
 from pymongo.errors import OperationFailure
 from config import get_database, COLLECTIONS
 
 
+def _presente(campo):
+    """
+    Filtro parcial para índices únicos: solo se indexan documentos con el campo.
+    
+    Los documentos sin el campo no ocupan entrada (MongoDB los indexaría como
+    null) ni entran en la comprobación de unicidad. Una consulta por igualdad
+    ({campo: valor}) implica $exists, así que el planificador sigue usando
+    el índice para esas búsquedas.
+    """
+    return {campo: {"$exists": True}}
+
+
+def _create_indexes(collection, indexes, lineas):
+    """
+    Crea los índices que aún no existen con un único comando createIndexes.
+    
+    Los índices ya presentes (por nombre) no se vuelven a enviar, así una
+    segunda ejecución solo consulta listIndexes. Los índices caros (texto y
+    compuesto) llevan background=True: en servidores anteriores a 4.2 evita
+    bloquear las escrituras durante la construcción; desde 4.2 se ignora.
+    
+    Args:
+        collection: Colección de MongoDB
+        indexes: Lista de tuplas (IndexModel, descripción para mostrar)
+        lineas: Lista donde se acumulan los mensajes de resultado
+    """
+    existing = set(collection.index_information())
+    missing = [model for model, _ in indexes if model.document["name"] not in existing]
+    if missing:
+        collection.create_indexes(missing)
+    
+    for model, descripcion in indexes:
+        if model.document["name"] in existing:
+            lineas.append(f"  = {descripcion} (ya existe)")
+        else:
+            lineas.append(f"  ✓ {descripcion}")
+
+
+def _drop_indexes(collection, names, lineas):
+    """
+    Elimina índices que ya no se usan, si existen (bases creadas con versiones anteriores).
+    
+    Args:
+        collection: Colección de MongoDB
+        names: Nombres de los índices a eliminar
+        lineas: Lista donde se acumulan los mensajes de resultado
+    """
+    existing = set(collection.index_information())
+    for name in names:
+        if name in existing:
+            collection.drop_index(name)
+            lineas.append(f"  ✗ Índice eliminado (redundante): {name}")
+
+
 def create_productos_indexes(db):
-    """Crea los índices para la colección de productos."""
+    """
+    Crea los índices para la colección de productos.
+    
+    Returns:
+        list: Mensajes de resultado (se imprimen al terminar, en orden)
+    """
     collection = db[COLLECTIONS['PRODUCTOS']]
     
-    try:
+    indexes = [
         # Índice único para codigoProducto
-        collection.create_index(
+        (IndexModel(
             [("codigoProducto", ASCENDING)],
             unique=True,
+            partialFilterExpression=_presente("codigoProducto"),
             name="idx_codigoProducto_unique"
-        )
-        print(f"  ✓ Índice único: codigoProducto")
+        ), "Índice único: codigoProducto"),
         
-        # Índice de texto para búsquedas en nombre y descripción
-        collection.create_index(
-            [("nombre", TEXT), ("descripcion", TEXT)],
-            default_language="spanish",
-            name="idx_text_nombre_descripcion"
-        )
-        print(f"  ✓ Índice de texto: nombre + descripcion (español)")
+        # Índice único para idProducto: clave de unión con reseñas e imágenes
+        # ($in de search_by_image, $lookup de imágenes, bulk_write de estadísticas)
+        (IndexModel(
+            [("idProducto", ASCENDING)],
+            unique=True,
+            name="idx_idProducto_unique"
+        ), "Índice único: idProducto"),
         
         # Índice compuesto para filtros por categoría, precio y calificación
-        collection.create_index(
+        (IndexModel(
             [
                 ("idCategoria", ASCENDING),
                 ("precioUsd", ASCENDING),
                 ("calificacionPromedio", DESCENDING)
             ],
+            background=True,
             name="idx_categoria_precio_calificacion"
-        )
-        print(f"  ✓ Índice compuesto: idCategoria + precioUsd + calificacionPromedio")
+        ), "Índice compuesto: idCategoria + precioUsd + calificacionPromedio"),
         
         # Índice simple para marca (nombre de marca embebida)
-        collection.create_index(
+        (IndexModel(
             [("marca.nombre", ASCENDING)],
             name="idx_marca_nombre"
-        )
-        print(f"  ✓ Índice simple: marca.nombre")
+        ), "Índice simple: marca.nombre"),
         
         # Índice para disponibilidad
-        collection.create_index(
+        (IndexModel(
             [("disponibilidad", ASCENDING)],
             name="idx_disponibilidad"
-        )
-        print(f"  ✓ Índice simple: disponibilidad")
-        
-        # Índice para búsqueda por calificación
-        collection.create_index(
-            [("calificacionPromedio", DESCENDING)],
-            name="idx_calificacionPromedio"
-        )
-        print(f"  ✓ Índice simple: calificacionPromedio")
-        
+        ), "Índice simple: disponibilidad"),
+    ]
+    
+    # calificacionPromedio ya está como sufijo de idx_categoria_precio_calificacion
+    # y ninguna consulta ordena por calificación en toda la colección: el índice
+    # propio solo añadía escrituras en cada inserción y actualización de estadísticas
+    obsolete_indexes = ["idx_calificacionPromedio"]
+    
+    # Índice de texto para búsquedas en nombre y descripción. Es el más caro
+    # (tokenizado y stemming en español), así que va en un comando aparte,
+    # después del resto: una sola llamada createIndexes construye todos sus
+    # índices en el mismo recorrido y ninguno queda disponible hasta el final.
+    text_indexes = [
+        (IndexModel(
+            [("nombre", TEXT), ("descripcion", TEXT)],
+            default_language="spanish",
+            weights={"nombre": 10, "descripcion": 1},
+            background=True,
+            name="idx_text_nombre_descripcion"
+        ), "Índice de texto: nombre (peso 10) + descripcion (español)"),
+    ]
+    
+    lineas = []
+    try:
+        _drop_indexes(collection, obsolete_indexes, lineas)
+        _create_indexes(collection, indexes, lineas)
+        _create_indexes(collection, text_indexes, lineas)
     except OperationFailure as e:
-        print(f"  ⚠ Error al crear índices de productos: {str(e)}")
+        lineas.append(f"  ⚠ Error al crear índices de productos: {str(e)}")
+    return lineas
 
 
 def create_imagenes_indexes(db):
-    """Crea los índices para la colección de imágenes."""
+    """
+    Crea los índices para la colección de imágenes.
+    
+    Returns:
+        list: Mensajes de resultado (se imprimen al terminar, en orden)
+    """
     collection = db[COLLECTIONS['IMAGENES']]
     
-    try:
+    indexes = [
         # Índice compuesto para obtener imágenes de un producto ordenadas
-        collection.create_index(
+        (IndexModel(
             [
                 ("idProducto", ASCENDING),
                 ("ordenVisualizacion", ASCENDING)
             ],
             name="idx_producto_orden"
-        )
-        print(f"  ✓ Índice compuesto: idProducto + ordenVisualizacion")
+        ), "Índice compuesto: idProducto + ordenVisualizacion"),
         
         # Índice para imagen principal por producto
-        collection.create_index(
+        (IndexModel(
             [
                 ("idProducto", ASCENDING),
                 ("esPrincipal", ASCENDING)
             ],
             name="idx_producto_principal"
-        )
-        print(f"  ✓ Índice compuesto: idProducto + esPrincipal")
+        ), "Índice compuesto: idProducto + esPrincipal"),
         
         # Índice por tipo de imagen
-        collection.create_index(
+        (IndexModel(
             [("tipoImagen", ASCENDING)],
             name="idx_tipoImagen"
-        )
-        print(f"  ✓ Índice simple: tipoImagen")
-        
+        ), "Índice simple: tipoImagen"),
+    ]
+    
+    lineas = []
+    try:
+        _create_indexes(collection, indexes, lineas)
     except OperationFailure as e:
-        print(f"  ⚠ Error al crear índices de imágenes: {str(e)}")
+        lineas.append(f"  ⚠ Error al crear índices de imágenes: {str(e)}")
+    return lineas
 
 
 def create_categorias_indexes(db):
-    """Crea los índices para la colección de categorías."""
+    """
+    Crea los índices para la colección de categorías.
+    
+    Returns:
+        list: Mensajes de resultado (se imprimen al terminar, en orden)
+    """
     collection = db[COLLECTIONS['CATEGORIAS']]
     
-    try:
+    indexes = [
         # Índice único para slug
-        collection.create_index(
+        (IndexModel(
             [("slug", ASCENDING)],
             unique=True,
+            partialFilterExpression=_presente("slug"),
             name="idx_slug_unique"
-        )
-        print(f"  ✓ Índice único: slug")
+        ), "Índice único: slug"),
         
         # Índice para jerarquía de categorías
-        collection.create_index(
+        (IndexModel(
             [("idCategoriaPadre", ASCENDING)],
             name="idx_categoriaPadre"
-        )
-        print(f"  ✓ Índice simple: idCategoriaPadre")
-        
+        ), "Índice simple: idCategoriaPadre"),
+    ]
+    
+    lineas = []
+    try:
+        _create_indexes(collection, indexes, lineas)
     except OperationFailure as e:
-        print(f"  ⚠ Error al crear índices de categorías: {str(e)}")
+        lineas.append(f"  ⚠ Error al crear índices de categorías: {str(e)}")
+    return lineas
 
 
 def create_usuarios_indexes(db):
-    """Crea los índices para la colección de usuarios."""
+    """
+    Crea los índices para la colección de usuarios.
+    
+    Returns:
+        list: Mensajes de resultado (se imprimen al terminar, en orden)
+    """
     collection = db[COLLECTIONS['USUARIOS']]
     
-    try:
+    indexes = [
         # Índice único para nombreUsuario
-        collection.create_index(
+        (IndexModel(
             [("nombreUsuario", ASCENDING)],
             unique=True,
+            partialFilterExpression=_presente("nombreUsuario"),
             name="idx_nombreUsuario_unique"
-        )
-        print(f"  ✓ Índice único: nombreUsuario")
+        ), "Índice único: nombreUsuario"),
         
         # Índice único para correo
-        collection.create_index(
+        (IndexModel(
             [("correo", ASCENDING)],
             unique=True,
+            partialFilterExpression=_presente("correo"),
             name="idx_correo_unique"
-        )
-        print(f"  ✓ Índice único: correo")
+        ), "Índice único: correo"),
         
         # Índice para compradores verificados
-        collection.create_index(
+        (IndexModel(
             [("compradorVerificado", ASCENDING)],
             name="idx_compradorVerificado"
-        )
-        print(f"  ✓ Índice simple: compradorVerificado")
+        ), "Índice simple: compradorVerificado"),
         
         # Índices para reseñas embebidas
-        collection.create_index(
+        (IndexModel(
             [("resenas.idProducto", ASCENDING)],
             name="idx_resenas_producto"
-        )
-        print(f"  ✓ Índice simple: resenas.idProducto")
+        ), "Índice simple: resenas.idProducto"),
         
-        collection.create_index(
+        (IndexModel(
             [("resenas.calificacion", DESCENDING)],
             name="idx_resenas_calificacion"
-        )
-        print(f"  ✓ Índice simple: resenas.calificacion")
+        ), "Índice simple: resenas.calificacion"),
         
-        collection.create_index(
+        (IndexModel(
             [("resenas.compraVerificada", ASCENDING)],
             name="idx_resenas_compraVerificada"
-        )
-        print(f"  ✓ Índice simple: resenas.compraVerificada")
-        
+        ), "Índice simple: resenas.compraVerificada"),
+    ]
+    
+    lineas = []
+    try:
+        _create_indexes(collection, indexes, lineas)
     except OperationFailure as e:
-        print(f"  ⚠ Error al crear índices de usuarios: {str(e)}")
+        lineas.append(f"  ⚠ Error al crear índices de usuarios: {str(e)}")
+    return lineas
 
 
 def create_all_indexes():
@@ -189,21 +288,22 @@ def create_all_indexes():
         
         db = get_database()
         
-        print(f"📁 Creando índices en '{COLLECTIONS['CATEGORIAS']}':")
-        create_categorias_indexes(db)
-        print()
-        
-        print(f"📁 Creando índices en '{COLLECTIONS['USUARIOS']}':")
-        create_usuarios_indexes(db)
-        print()
-        
-        print(f"📁 Creando índices en '{COLLECTIONS['PRODUCTOS']}':")
-        create_productos_indexes(db)
-        print()
-        
-        print(f"📁 Creando índices en '{COLLECTIONS['IMAGENES']}':")
-        create_imagenes_indexes(db)
-        print()
+        # Las colecciones son independientes: sus comandos se envían en
+        # paralelo y los mensajes se imprimen después en orden fijo
+        tareas = [
+            (COLLECTIONS['CATEGORIAS'], create_categorias_indexes),
+            (COLLECTIONS['USUARIOS'], create_usuarios_indexes),
+            (COLLECTIONS['PRODUCTOS'], create_productos_indexes),
+            (COLLECTIONS['IMAGENES'], create_imagenes_indexes),
+        ]
+        with ThreadPoolExecutor(max_workers=len(tareas)) as executor:
+            futuros = [(nombre, executor.submit(fn, db)) for nombre, fn in tareas]
+            
+            for nombre, futuro in futuros:
+                print(f"📁 Creando índices en '{nombre}':")
+                for linea in futuro.result():
+                    print(linea)
+                print()
         
         print("="*60)
         print("✓ TODOS LOS ÍNDICES CREADOS EXITOSAMENTE")
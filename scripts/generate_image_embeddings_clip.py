@@ -170,14 +170,31 @@ def main():
     
     # Obtener todos los documentos de imágenes
     print("📊 Obteniendo metadatos de imágenes desde MongoDB...")
-    total_docs = imagenes_collection.count_documents({})
+    # Total, con embedding y dimensión en un solo round-trip ($size evita traer el vector)
+    facts = next(imagenes_collection.aggregate([
+        {"$facet": {
+            "total": [{"$count": "n"}],
+            "with_emb": [
+                {"$match": {"imagen_embedding_clip": {"$exists": True}}},
+                {"$count": "n"}
+            ],
+            "sample": [
+                # $exists también acepta null y $size sobre null aborta el aggregate
+                {"$match": {"imagen_embedding_clip": {"$type": "array"}}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "dim": {"$size": "$imagen_embedding_clip"}}}
+            ]
+        }}
+    ]), {})
+    total_docs = (facts.get("total") or [{}])[0].get("n", 0)
+    with_embeddings = (facts.get("with_emb") or [{}])[0].get("n", 0)
+    sample = (facts.get("sample") or [{}])[0]
     print(f"   Total de imágenes en BD: {total_docs}")
     
-    # Contar cuántas ya tienen embeddings
-    with_embeddings = imagenes_collection.count_documents(
-        {"imagen_embedding_clip": {"$exists": True}}
-    )
+    # Cuántas ya tienen embeddings
     print(f"   Con embeddings CLIP: {with_embeddings}")
+    if sample.get("dim"):
+        print(f"   Dimensión de embeddings: {sample['dim']}")
     print(f"   Sin embeddings: {total_docs - with_embeddings}")
     
     # Solo generar los faltantes (sin embeddings)
@@ -16,6 +16,7 @@ sys.path.insert(0, str(ROOT_DIR))
 # Cargar variables de entorno
 load_dotenv()
 
+from pymongo import UpdateOne
 from sentence_transformers import SentenceTransformer
 from config.mongodb_config import get_database
 
@@ -23,13 +24,62 @@ from config.mongodb_config import get_database
 EMBEDDING_MODEL_NAME = 'sentence-transformers/all-MiniLM-L6-v2'
 BATCH_SIZE = 32
 
-def generate_text_embedding(text: str, model) -> list:
-    """Genera embedding para un texto."""
-    if not text or not text.strip():
-        return None
+def embed_documents(collection, documentos, text_field, embedding_field, model, etiqueta):
+    """
+    Genera embeddings por lotes de BATCH_SIZE y los guarda con un bulk_write por lote.
+    
+    Args:
+        collection: Colección de MongoDB a actualizar
+        documentos: Documentos con '_id' y el campo de texto
+        text_field: Campo con el texto a codificar
+        embedding_field: Campo donde se guarda el embedding
+        model: Modelo SentenceTransformer
+        etiqueta: Nombre de los documentos para los mensajes
+        
+    Returns:
+        tuple: (exitosos, errores)
+    """
+    # Descartar textos vacíos o solo con espacios
+    documentos = [doc for doc in documentos if (doc.get(text_field) or '').strip()]
+    
+    success_count = 0
+    error_count = 0
+    
+    with tqdm(total=len(documentos), desc="Procesando") as progreso:
+        for inicio in range(0, len(documentos), BATCH_SIZE):
+            lote = documentos[inicio:inicio + BATCH_SIZE]
+            try:
+                # Una sola pasada del modelo por lote
+                embeddings = model.encode(
+                    [doc[text_field] for doc in lote],
+                    batch_size=BATCH_SIZE,
+                    show_progress_bar=False,
+                    normalize_embeddings=True  # Vectores unitarios desde la ingesta
+                )
+                
+                operaciones = [
+                    UpdateOne(
+                        {'_id': doc['_id']},
+                        {
+                            '$set': {
+                                embedding_field: embedding.tolist(),
+                                'embedding_model': EMBEDDING_MODEL_NAME,
+                                'embedding_dimensions': len(embedding)
+                            }
+                        }
+                    )
+                    for doc, embedding in zip(lote, embeddings)
+                ]
+                collection.bulk_write(operaciones, ordered=False)
+                success_count += len(lote)
+                
+            except Exception as e:
+                print(f"\n   ⚠️ Error en lote de {etiqueta} ({len(lote)} documentos): {e}")
+                error_count += len(lote)
+            
+            progreso.update(len(lote))
     
-    embedding = model.encode(text, show_progress_bar=False)
-    return embedding.tolist()
+    return success_count, error_count
 
 
 def generate_product_embeddings():
@@ -49,14 +99,17 @@ def generate_product_embeddings():
     
     # Obtener productos sin embeddings o con descripciones actualizadas
     print("\n📊 Analizando productos...")
-    productos = list(productos_collection.find({}))
-    print(f"   Total de productos: {len(productos)}")
-    
-    # Filtrar productos que necesitan embeddings
-    productos_sin_embedding = [
-        p for p in productos 
-        if not p.get('descripcion_embedding') and p.get('descripcion')
-    ]
+    total_productos = productos_collection.estimated_document_count()
+    print(f"   Total de productos: {total_productos}")
+    
+    # Filtrar en el servidor los productos que necesitan embeddings (sin traer vectores)
+    productos_sin_embedding = list(productos_collection.find(
+        {
+            'descripcionEmbedding': {'$in': [None, []]},
+            'descripcion': {'$nin': [None, '']}
+        },
+        {'_id': 1, 'codigoProducto': 1, 'descripcion': 1}
+    ))
     
     print(f"   Productos sin embedding: {len(productos_sin_embedding)}")
     
@@ -66,36 +119,14 @@ def generate_product_embeddings():
     
     # Generar embeddings
     print("\n🔄 Generando embeddings...")
-    success_count = 0
-    error_count = 0
-    
-    for producto in tqdm(productos_sin_embedding, desc="Procesando"):
-        try:
-            descripcion = producto.get('descripcion', '')
-            
-            if not descripcion:
-                continue
-            
-            # Generar embedding
-            embedding = generate_text_embedding(descripcion, model)
-            
-            if embedding:
-                # Actualizar en BD
-                productos_collection.update_one(
-                    {'_id': producto['_id']},
-                    {
-                        '$set': {
-                            'descripcion_embedding': embedding,
-                            'embedding_model': EMBEDDING_MODEL_NAME,
-                            'embedding_dimensions': len(embedding)
-                        }
-                    }
-                )
-                success_count += 1
-            
-        except Exception as e:
-            print(f"\n   ⚠️ Error en producto {producto.get('codigoProducto', 'N/A')}: {e}")
-            error_count += 1
+    success_count, error_count = embed_documents(
+        productos_collection,
+        productos_sin_embedding,
+        'descripcion',
+        'descripcionEmbedding',
+        model,
+        'productos'
+    )
     
     print(f"\n✅ Completado:")
     print(f"   ✓ Exitosos: {success_count}")
@@ -103,9 +134,9 @@ def generate_product_embeddings():
     
     # Verificar
     total_con_embedding = productos_collection.count_documents({
-        'descripcion_embedding': {'$exists': True}
+        'descripcionEmbedding': {'$exists': True}
     })
-    print(f"\n🎯 Total de productos con embedding: {total_con_embedding}/{len(productos)}")
+    print(f"\n🎯 Total de productos con embedding: {total_con_embedding}/{total_productos}")
 
 
 def generate_review_embeddings():
@@ -125,14 +156,17 @@ def generate_review_embeddings():
     
     # Obtener reseñas sin embeddings
     print("\n📊 Analizando reseñas...")
-    resenas = list(resenas_collection.find({}))
-    print(f"   Total de reseñas: {len(resenas)}")
-    
-    # Filtrar reseñas que necesitan embeddings
-    resenas_sin_embedding = [
-        r for r in resenas 
-        if not r.get('contenido_embedding') and r.get('contenido')
-    ]
+    total_resenas = resenas_collection.estimated_document_count()
+    print(f"   Total de reseñas: {total_resenas}")
+    
+    # Filtrar en el servidor las reseñas que necesitan embeddings (sin traer vectores)
+    resenas_sin_embedding = list(resenas_collection.find(
+        {
+            'contenido_embedding': {'$in': [None, []]},
+            'contenido': {'$nin': [None, '']}
+        },
+        {'_id': 1, 'contenido': 1}
+    ))
     
     print(f"   Reseñas sin embedding: {len(resenas_sin_embedding)}")
     
@@ -142,36 +176,14 @@ def generate_review_embeddings():
     
     # Generar embeddings
     print("\n🔄 Generando embeddings...")
-    success_count = 0
-    error_count = 0
-    
-    for resena in tqdm(resenas_sin_embedding, desc="Procesando"):
-        try:
-            contenido = resena.get('contenido', '')
-            
-            if not contenido:
-                continue
-            
-            # Generar embedding
-            embedding = generate_text_embedding(contenido, model)
-            
-            if embedding:
-                # Actualizar en BD
-                resenas_collection.update_one(
-                    {'_id': resena['_id']},
-                    {
-                        '$set': {
-                            'contenido_embedding': embedding,
-                            'embedding_model': EMBEDDING_MODEL_NAME,
-                            'embedding_dimensions': len(embedding)
-                        }
-                    }
-                )
-                success_count += 1
-            
-        except Exception as e:
-            print(f"\n   ⚠️ Error en reseña: {e}")
-            error_count += 1
+    success_count, error_count = embed_documents(
+        resenas_collection,
+        resenas_sin_embedding,
+        'contenido',
+        'contenido_embedding',
+        model,
+        'reseñas'
+    )
     
     print(f"\n✅ Completado:")
     print(f"   ✓ Exitosos: {success_count}")
@@ -181,7 +193,7 @@ def generate_review_embeddings():
     total_con_embedding = resenas_collection.count_documents({
         'contenido_embedding': {'$exists': True}
     })
-    print(f"\n🎯 Total de reseñas con embedding: {total_con_embedding}/{len(resenas)}")
+    print(f"\n🎯 Total de reseñas con embedding: {total_con_embedding}/{total_resenas}")
 
 
 if __name__ == "__main__":
@@ -5,21 +5,27 @@ Modelo actualizado: marcas embebidas en productos, reseñas embebidas en usuario
 
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from bson import ObjectId
-from sentence_transformers import SentenceTransformer
-from tqdm import tqdm
+from pymongo import UpdateOne
 
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from config import get_database, COLLECTIONS, DATA_FILES, EMBEDDING_MODEL_NAME
+from config import get_database, COLLECTIONS, DATA_FILES, EMBEDDING_MODEL_NAME, BATCH_SIZE, CORREO_PATTERN
 
 
 # Variable global para el modelo de embeddings
 _embedding_model = None
 
+# Textos por lote al generar embeddings
+EMBEDDING_BATCH_SIZE = 64
+
+# Lotes de inserción enviados en paralelo a MongoDB
+INSERT_WORKERS = 8
+
 
 def get_embedding_model():
     """
@@ -30,6 +36,9 @@ def get_embedding_model():
     """
     global _embedding_model
     if _embedding_model is None:
+        # Import diferido: importar scripts no debe cargar torch/transformers
+        from sentence_transformers import SentenceTransformer
+        
         print(f"📥 Cargando modelo de embeddings: {EMBEDDING_MODEL_NAME}")
         _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
         print(f"✓ Modelo cargado correctamente")
@@ -47,10 +56,70 @@ def generate_embedding(text):
         list: Vector de embedding (384 dimensiones)
     """
     model = get_embedding_model()
-    embedding = model.encode(text)
+    # Vectores unitarios: la similitud coseno queda como un producto punto
+    embedding = model.encode(text, normalize_embeddings=True)
     return embedding.tolist()  # Convertir numpy array a lista
 
 
+def generate_embeddings(texts, desc="Generando embeddings"):
+    """
+    Genera embeddings para una lista de textos en lotes.
+    
+    Un único encode() por lote aprovecha la vectorización del modelo
+    (mucho más rápido que codificar los textos uno por uno).
+    
+    Args:
+        texts (list): Textos a convertir en embeddings
+        desc (str): Descripción mostrada en la barra de progreso
+        
+    Returns:
+        list: Lista de vectores (384 dimensiones cada uno), en el mismo orden
+    """
+    if not texts:
+        return []
+    
+    model = get_embedding_model()
+    print(f"  🔄 {desc} ({len(texts)} textos)...")
+    embeddings = model.encode(
+        texts,
+        batch_size=EMBEDDING_BATCH_SIZE,
+        show_progress_bar=True,
+        convert_to_numpy=True,
+        normalize_embeddings=True  # Vectores unitarios desde la ingesta
+    )
+    return embeddings.tolist()
+
+
+def insert_in_batches(collection, documentos):
+    """
+    Inserta documentos en lotes de BATCH_SIZE enviados en paralelo.
+    
+    Durante la carga inicial las colecciones están vacías y los documentos
+    se construyen aquí mismo, así que se usa inserción no ordenada y sin
+    validación de esquema en el servidor (el validador sigue activo para
+    cualquier escritura posterior).
+    
+    Args:
+        collection: Colección de MongoDB destino
+        documentos (list): Documentos a insertar
+        
+    Returns:
+        int: Número de documentos insertados
+    """
+    lotes = [documentos[i:i + BATCH_SIZE] for i in range(0, len(documentos), BATCH_SIZE)]
+    
+    def insertar(lote):
+        result = collection.insert_many(
+            lote,
+            ordered=False,
+            bypass_document_validation=True
+        )
+        return len(result.inserted_ids)
+    
+    with ThreadPoolExecutor(max_workers=INSERT_WORKERS) as executor:
+        return sum(executor.map(insertar, lotes))
+
+
 def load_json_file(file_path):
     """
     Carga un archivo JSON.
@@ -61,11 +130,12 @@ def load_json_file(file_path):
     Returns:
         list/dict: Datos del archivo JSON
     """
-    if not os.path.exists(file_path):
+    # open() ya detecta la ausencia del archivo; evita un stat() previo
+    try:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
         raise FileNotFoundError(f"No se encontró el archivo: {file_path}")
-    
-    with open(file_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
 
 
 def load_categorias(db):
@@ -89,6 +159,8 @@ def load_categorias(db):
     categorias_data = load_json_file(DATA_FILES['CATEGORIAS'])
     
     # Preparar documentos para inserción con IDs secuenciales
+    # Una sola marca de tiempo para todos los documentos del lote
+    now = datetime.now()
     documentos = []
     categoria_map = {}
     
@@ -99,14 +171,14 @@ def load_categorias(db):
             "slug": categoria["slug"],
             "descripcion": categoria.get("descripcion", ""),
             "idCategoriaPadre": categoria.get("id_categoria_padre"),
-            "fechaCreacion": datetime.now()
+            "fechaCreacion": now
         }
         documentos.append(doc)
         categoria_map[categoria["slug"]] = idx
     
     # Insertar documentos
-    result = collection.insert_many(documentos)
-    print(f"  ✓ {len(result.inserted_ids)} categorías insertadas")
+    insertados = insert_in_batches(collection, documentos)
+    print(f"  ✓ {insertados} categorías insertadas")
     
     return categoria_map
 
@@ -142,10 +214,12 @@ def load_productos(db, categorias_map):
     get_embedding_model()
     
     # Preparar documentos para inserción
+    # Una sola marca de tiempo para todos los documentos del lote
+    now = datetime.now()
     documentos = []
     productos_map = {}
     
-    for idx, producto in enumerate(tqdm(productos_data, desc="Generando embeddings de productos"), start=1):
+    for idx, producto in enumerate(productos_data, start=1):
         # Obtener datos de marca
         marca_nombre = producto.get("marca_nombre")
         if marca_nombre not in marcas_dict:
@@ -164,9 +238,7 @@ def load_productos(db, categorias_map):
         # Obtener ID de categoría
         categoria_id = categorias_map[categoria_slug]
         
-        # Generar embedding de la descripción
         descripcion = producto["descripcion"]
-        descripcion_embedding = generate_embedding(descripcion)
         
         # Parsear fecha de lanzamiento
         fecha_lanzamiento = producto.get("fecha_lanzamiento")
@@ -186,15 +258,14 @@ def load_productos(db, categorias_map):
             "disponibilidad": producto.get("disponibilidad", "en_stock"),
             "calificacionPromedio": float(producto.get("calificacion_promedio", 0.0)),
             "cantidadResenas": int(producto.get("cantidad_resenas", 0)),
-            "fechaCreacion": datetime.now(),
-            "fechaActualizacion": datetime.now(),
+            "fechaCreacion": now,
+            "fechaActualizacion": now,
             "marca": {  # EMBEBIDO: Datos completos de la marca (desnormalización)
                 "nombre": marca_info["nombre"],
                 "pais": marca_info["pais"],
                 "sitioWeb": marca_info.get("sitio_web", ""),
                 "descripcion": marca_info.get("descripcion", "")
-            },
-            "descripcionEmbedding": descripcion_embedding
+            }
         }
         
         # Añadir campos de especificaciones PLANAS (no anidadas)
@@ -212,10 +283,18 @@ def load_productos(db, categorias_map):
         documentos.append(doc)
         productos_map[producto["codigo_producto"]] = idx
     
+    # Generar todos los embeddings de descripciones en lotes
+    embeddings = generate_embeddings(
+        [doc["descripcion"] for doc in documentos],
+        desc="Generando embeddings de productos"
+    )
+    for doc, embedding in zip(documentos, embeddings):
+        doc["descripcionEmbedding"] = embedding
+    
     # Insertar documentos
     if documentos:
-        result = collection.insert_many(documentos)
-        print(f"✓ {len(result.inserted_ids)} productos cargados con embeddings y marcas embebidas")
+        insertados = insert_in_batches(collection, documentos)
+        print(f"✓ {insertados} productos cargados con embeddings y marcas embebidas")
     else:
         print("⚠ No se cargaron productos")
         return {}
@@ -258,19 +337,29 @@ def load_usuarios_con_resenas(db, productos_map):
     get_embedding_model()
     
     # Preparar documentos para inserción
+    # Una sola marca de tiempo para todos los documentos del lote
+    now = datetime.now()
     documentos = []
     usuarios_map = {}
     
-    for idx, usuario in enumerate(tqdm(usuarios_data, desc="Cargando usuarios con reseñas"), start=1):
+    # Reseñas pendientes de embedding (se codifican todas juntas al final)
+    resenas_pendientes = []
+    
+    for idx, usuario in enumerate(usuarios_data, start=1):
         # Parsear fecha si está en formato string
         fecha_creacion = usuario.get("fecha_creacion")
         if isinstance(fecha_creacion, str):
             fecha_creacion = datetime.fromisoformat(fecha_creacion)
         else:
-            fecha_creacion = datetime.now()
+            fecha_creacion = now
         
         nombre_usuario = usuario["nombre_usuario"]
         
+        # El esquema solo exige '@': el formato completo del correo se valida aquí
+        if not CORREO_PATTERN.match(usuario["correo"]):
+            print(f"⚠ Advertencia: Correo '{usuario['correo']}' no válido. Omitiendo usuario '{nombre_usuario}'.")
+            continue
+        
         # Obtener reseñas del usuario
         resenas_usuario = resenas_por_usuario.get(nombre_usuario, [])
         resenas_embebidas = []
@@ -282,16 +371,14 @@ def load_usuarios_con_resenas(db, productos_map):
                 print(f"⚠ Advertencia: Producto '{codigo_producto}' no encontrado. Omitiendo reseña.")
                 continue
             
-            # Generar embedding del contenido
             contenido = resena["contenido"]
-            contenido_embedding = generate_embedding(contenido)
             
             # Parsear fecha si está en formato string
             fecha_resena = resena.get("fecha_creacion")
             if isinstance(fecha_resena, str):
                 fecha_resena = datetime.fromisoformat(fecha_resena)
             else:
-                fecha_resena = datetime.now()
+                fecha_resena = now
             
             # Crear reseña embebida con camelCase
             resena_doc = {
@@ -305,11 +392,11 @@ def load_usuarios_con_resenas(db, productos_map):
                 "idioma": resena.get("idioma", "es"),
                 "votosUtiles": resena.get("votos_utiles", 0),
                 "compraVerificada": resena.get("compra_verificada", False),
-                "contenidoEmbedding": contenido_embedding,
                 "fechaCreacion": fecha_resena,
-                "fechaActualizacion": datetime.now()
+                "fechaActualizacion": now
             }
             resenas_embebidas.append(resena_doc)
+            resenas_pendientes.append(resena_doc)
         
         # Construir documento de usuario con reseñas embebidas (camelCase)
         doc = {
@@ -320,16 +407,24 @@ def load_usuarios_con_resenas(db, productos_map):
             "compradorVerificado": usuario.get("comprador_verificado", False),
             "resenas": resenas_embebidas,  # Array de reseñas embebidas
             "fechaCreacion": fecha_creacion,
-            "ultimoAcceso": datetime.now()
+            "ultimoAcceso": now
         }
         documentos.append(doc)
         usuarios_map[nombre_usuario] = idx
     
+    # Generar todos los embeddings de reseñas en lotes
+    embeddings = generate_embeddings(
+        [resena_doc["contenido"] for resena_doc in resenas_pendientes],
+        desc="Generando embeddings de reseñas"
+    )
+    for resena_doc, embedding in zip(resenas_pendientes, embeddings):
+        resena_doc["contenidoEmbedding"] = embedding
+    
     # Insertar documentos
     if documentos:
-        result = collection.insert_many(documentos)
+        insertados = insert_in_batches(collection, documentos)
         total_resenas = sum(len(doc["resenas"]) for doc in documentos)
-        print(f"✓ {len(result.inserted_ids)} usuarios cargados")
+        print(f"✓ {insertados} usuarios cargados")
         print(f"✓ {total_resenas} reseñas embebidas con embeddings")
     else:
         print("⚠ No se cargaron usuarios")
@@ -356,15 +451,16 @@ def load_imagenes(db, productos_map):
     # Limpiar colección existente
     collection.delete_many({})
     
-    # Verificar si existe el archivo
-    if not os.path.exists(DATA_FILES['IMAGENES']):
+    # Cargar datos del JSON (el archivo de imágenes es opcional)
+    try:
+        imagenes_data = load_json_file(DATA_FILES['IMAGENES'])
+    except FileNotFoundError:
         print(f"⚠ Archivo {DATA_FILES['IMAGENES']} no encontrado. Omitiendo carga de imágenes.")
         return 0
     
-    # Cargar datos del JSON
-    imagenes_data = load_json_file(DATA_FILES['IMAGENES'])
-    
     # Preparar documentos para inserción
+    # Una sola marca de tiempo para todos los documentos del lote
+    now = datetime.now()
     documentos = []
     
     for idx, imagen in enumerate(imagenes_data, start=1):
@@ -391,7 +487,7 @@ def load_imagenes(db, productos_map):
             "textoAlternativo": imagen.get("texto_alternativo", ""),
             "esPrincipal": imagen.get("es_principal", False),
             "ordenVisualizacion": imagen.get("orden_visualizacion", 1),
-            "fechaSubida": datetime.now()
+            "fechaSubida": now
         }
         
         # Nota: Los embeddings de imágenes se generarían con CLIP
@@ -401,9 +497,9 @@ def load_imagenes(db, productos_map):
     
     # Insertar documentos
     if documentos:
-        result = collection.insert_many(documentos)
-        print(f"✓ {len(result.inserted_ids)} metadatos de imágenes cargados")
-        return len(result.inserted_ids)
+        insertados = insert_in_batches(collection, documentos)
+        print(f"✓ {insertados} metadatos de imágenes cargados")
+        return insertados
     else:
         print("⚠ No se cargaron metadatos de imágenes")
         return 0
@@ -422,37 +518,42 @@ def update_productos_stats(db):
     productos_collection = db[COLLECTIONS['PRODUCTOS']]
     usuarios_collection = db[COLLECTIONS['USUARIOS']]
     
-    # Para cada producto, calcular estadísticas de reseñas
-    productos = productos_collection.find()
+    # Una sola agregación agrupa las reseñas embebidas por producto
+    # (antes: una consulta a usuarios por cada producto)
+    pipeline = [
+        {"$match": {"resenas.0": {"$exists": True}}},
+        {"$unwind": "$resenas"},
+        {"$group": {
+            "_id": "$resenas.idProducto",
+            "promedio": {"$avg": "$resenas.calificacion"},
+            "cantidad": {"$sum": 1}
+        }}
+    ]
+    
+    # Actualizar productos con campos planos (camelCase) en un solo bulk_write.
+    # Forma parte de la carga inicial, como insert_in_batches: los valores se
+    # calculan aquí (promedio 1-5, conteo >= 0) y no se revalidan en el servidor
+    operaciones = [
+        UpdateOne(
+            {"idProducto": stats["_id"]},
+            {
+                "$set": {
+                    "calificacionPromedio": round(stats["promedio"], 2),
+                    "cantidadResenas": stats["cantidad"]
+                }
+            }
+        )
+        for stats in usuarios_collection.aggregate(pipeline)
+    ]
     
     actualizados = 0
-    for producto in productos:
-        # Buscar todas las reseñas del producto en los usuarios (ahora usa idProducto integer)
-        usuarios_con_resenas = usuarios_collection.find({
-            "resenas.idProducto": producto["idProducto"]
-        })
-        
-        calificaciones = []
-        for usuario in usuarios_con_resenas:
-            for resena in usuario.get("resenas", []):
-                if resena["idProducto"] == producto["idProducto"]:
-                    calificaciones.append(resena["calificacion"])
-        
-        if calificaciones:
-            # Calcular promedio de calificaciones
-            promedio = sum(calificaciones) / len(calificaciones)
-            
-            # Actualizar producto con campos planos (camelCase)
-            productos_collection.update_one(
-                {"_id": producto["_id"]},
-                {
-                    "$set": {
-                        "calificacionPromedio": round(promedio, 2),
-                        "cantidadResenas": len(calificaciones)
-                    }
-                }
-            )
-            actualizados += 1
+    if operaciones:
+        result = productos_collection.bulk_write(
+            operaciones,
+            ordered=False,
+            bypass_document_validation=True
+        )
+        actualizados = result.matched_count
     
     print(f"✓ {actualizados} productos actualizados con estadísticas de reseñas")
 
@@ -4,9 +4,29 @@ Script de prueba para validar integración Groq LLM y nuevas funcionalidades.
 
 import requests
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 BASE_URL = "http://localhost:5000"
 
+# Máximo de consultas RAG simultáneas (evita disparar el rate limit de Groq)
+MAX_PARALLEL_REQUESTS = 4
+
+# Sesión compartida: todos los tests reutilizan la misma conexión keep-alive
+_session = requests.Session()
+
+# requests.Session no es thread-safe: cada hilo de test_rag_parallel usa la suya
+_thread_local = threading.local()
+
+
+def _worker_session():
+    """Sesión keep-alive propia del hilo actual."""
+    session = getattr(_thread_local, "session", None)
+    if session is None:
+        session = _thread_local.session = requests.Session()
+    return session
+
 def print_section(title):
     print("\n" + "="*70)
     print(f"🧪 {title}")
@@ -27,7 +47,7 @@ def test_rag_with_llm():
     print(f"📤 Enviando query: {payload['query']}")
     
     try:
-        response = requests.post(url, json=payload, timeout=30)
+        response = _session.post(url, json=payload, timeout=30)
         
         if response.status_code == 200:
             data = response.json()
@@ -53,6 +73,80 @@ def test_rag_with_llm():
         print(f"❌ Error en request: {e}")
 
 
+def test_rag_batch():
+    """Prueba el endpoint RAG por lotes (un solo request para varias consultas)."""
+    print_section("TEST 1b: RAG por lotes")
+    
+    url = f"{BASE_URL}/rag/batch"
+    payload = {
+        "queries": [
+            "laptops gaming con buena refrigeración",
+            "smartphone con buena cámara",
+            "audífonos con cancelación de ruido",
+            "monitor para diseño gráfico"
+        ],
+        "max_products": 3,
+        "include_reviews": False
+    }
+    
+    print(f"📤 Enviando {len(payload['queries'])} consultas en un solo request")
+    
+    try:
+        response = _session.post(url, json=payload, timeout=60)
+        
+        if response.status_code == 200:
+            data = response.json()
+            
+            print(f"\n✅ {data['total']} respuestas recibidas")
+            for resultado in data['results']:
+                print(f"\n🔍 {resultado['query']}")
+                print(f"   📊 Productos: {resultado['metadata']['total_productos']}")
+                print(f"   🤖 {resultado['rag_response'][:150]}...")
+        else:
+            print(f"❌ Error {response.status_code}: {response.text}")
+            
+    except Exception as e:
+        print(f"❌ Error en request: {e}")
+
+
+def test_rag_parallel():
+    """Lanza varias consultas RAG independientes en paralelo y muestra cada una al llegar."""
+    print_section("TEST 1c: Consultas RAG en paralelo")
+    
+    url = f"{BASE_URL}/rag"
+    queries = [
+        "laptops gaming con buena refrigeración",
+        "smartphone con buena cámara",
+        "audífonos con cancelación de ruido",
+        "monitor para diseño gráfico"
+    ]
+    
+    def enviar(query):
+        payload = {"query": query, "max_products": 3, "include_reviews": False}
+        return query, _worker_session().post(url, json=payload, timeout=60)
+    
+    inicio = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=MAX_PARALLEL_REQUESTS) as executor:
+        futuros = [executor.submit(enviar, query) for query in queries]
+        
+        # Resultados en orden de llegada
+        for futuro in as_completed(futuros):
+            try:
+                query, response = futuro.result()
+            except Exception as e:
+                print(f"❌ Error en request: {e}")
+                continue
+            
+            if response.status_code == 200:
+                data = response.json()
+                print(f"\n🔍 {query}")
+                print(f"   🤖 {data['rag_response'][:150]}...")
+            else:
+                print(f"❌ Error {response.status_code} en '{query}': {response.text}")
+    
+    print(f"\n⏱️ {len(queries)} consultas en {time.perf_counter() - inicio:.1f}s")
+
+
 def test_update_caption():
     """Prueba la actualización de caption."""
     print_section("TEST 2: Actualizar Caption")
@@ -66,7 +160,7 @@ def test_update_caption():
     print(f"📤 Actualizando caption para: {payload['title']}")
     
     try:
-        response = requests.post(url, json=payload, timeout=10)
+        response = _session.post(url, json=payload, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -93,7 +187,7 @@ def test_show_results():
     print(f"📤 Query: {payload['query']}")
     
     try:
-        response = requests.post(url, json=payload, timeout=20)
+        response = _session.post(url, json=payload, timeout=20)
         
         if response.status_code == 200:
             data = response.json()
@@ -121,7 +215,7 @@ def test_stats():
     url = f"{BASE_URL}/api/stats"
     
     try:
-        response = requests.get(url, timeout=10)
+        response = _session.get(url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -143,7 +237,7 @@ def test_health():
     url = f"{BASE_URL}/"
     
     try:
-        response = requests.get(url, timeout=5)
+        response = _session.get(url, timeout=5)
         
         if response.status_code == 200:
             print(f"✅ Servidor activo en {BASE_URL}")
@@ -168,6 +262,8 @@ if __name__ == "__main__":
     
     # Tests principales
     test_rag_with_llm()
+    test_rag_batch()
+    test_rag_parallel()
     test_show_results()
     test_update_caption()
     test_stats()
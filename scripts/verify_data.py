@@ -12,7 +12,8 @@ def count_documents(db):
     
     total = 0
     for collection_name in COLLECTIONS.values():
-        count = db[collection_name].count_documents({})
+        # Conteo desde metadatos de la colección (no recorre documentos)
+        count = db[collection_name].estimated_document_count()
         print(f"  {collection_name:25s}: {count:6d} documentos")
         total += count
     
@@ -29,20 +30,30 @@ def verify_embeddings(db):
     
     # Verificar embeddings de productos
     productos_col = db[COLLECTIONS['PRODUCTOS']]
-    total_productos = productos_col.count_documents({})
-    productos_con_embedding = productos_col.count_documents({
-        "descripcionEmbedding": {"$exists": True, "$ne": None}
-    })
+    total_productos = productos_col.estimated_document_count()
+    
+    # Conteo y dimensión en el servidor: solo viajan dos enteros, no el vector
+    pipeline = [
+        {"$match": {"descripcionEmbedding": {"$exists": True, "$ne": None}}},
+        {"$facet": {
+            "con_embedding": [{"$count": "n"}],
+            "dimension": [
+                {"$limit": 1},
+                {"$project": {"_id": 0, "n": {"$size": {"$ifNull": ["$descripcionEmbedding", []]}}}}
+            ]
+        }}
+    ]
+    facts = next(productos_col.aggregate(pipeline), {})
+    productos_con_embedding = (facts.get("con_embedding") or [{}])[0].get("n", 0)
+    dim_productos = (facts.get("dimension") or [{}])[0].get("n")
     
     print(f"  Productos totales: {total_productos}")
     print(f"  Productos con embedding: {productos_con_embedding}")
     
     if productos_con_embedding > 0:
         # Verificar dimensión del embedding
-        producto_sample = productos_col.find_one({"descripcionEmbedding": {"$exists": True}})
-        if producto_sample and "descripcionEmbedding" in producto_sample:
-            dim = len(producto_sample["descripcionEmbedding"])
-            print(f"  Dimensión de embeddings: {dim}")
+        if dim_productos:
+            print(f"  Dimensión de embeddings: {dim_productos}")
             print(f"  ✓ Embeddings de productos OK")
         else:
             print(f"  ⚠ No se pudo verificar la dimensión")
@@ -53,24 +64,42 @@ def verify_embeddings(db):
     
     # Verificar embeddings de reseñas (ahora embebidas en usuarios)
     usuarios_col = db[COLLECTIONS['USUARIOS']]
-    total_usuarios = usuarios_col.count_documents({})
-    usuarios_con_resenas = usuarios_col.count_documents({
-        "resenas": {"$exists": True, "$ne": []}
-    })
+    total_usuarios = usuarios_col.estimated_document_count()
     
-    # Contar total de reseñas embebidas
+    # Un solo $facet resuelve los tres conteos en un único round-trip
     pipeline = [
         {"$match": {"resenas": {"$exists": True}}},
-        {"$project": {"num_resenas": {"$size": {"$ifNull": ["$resenas", []]}}}},
-        {"$group": {"_id": None, "total": {"$sum": "$num_resenas"}}}
+        {"$facet": {
+            "con_resenas": [
+                {"$match": {"resenas": {"$ne": []}}},
+                {"$count": "n"}
+            ],
+            "total_resenas": [
+                {"$group": {"_id": None, "n": {"$sum": {"$size": {"$ifNull": ["$resenas", []]}}}}}
+            ],
+            "con_embeddings": [
+                {"$match": {"resenas.contenidoEmbedding": {"$exists": True}}},
+                {"$count": "n"}
+            ],
+            "dimension": [
+                {"$match": {"resenas.contenidoEmbedding": {"$exists": True}}},
+                {"$limit": 1},
+                {"$project": {"_id": 0, "n": {"$size": {"$ifNull": [
+                    {"$arrayElemAt": ["$resenas.contenidoEmbedding", 0]}, []
+                ]}}}}
+            ]
+        }}
     ]
-    result = list(usuarios_col.aggregate(pipeline))
-    total_resenas = result[0]["total"] if result else 0
+    facts = next(usuarios_col.aggregate(pipeline), {})
+    
+    def _facet_value(nombre):
+        valores = facts.get(nombre) or [{}]
+        return valores[0].get("n", 0)
     
-    # Contar reseñas con embeddings
-    usuarios_con_embeddings = usuarios_col.count_documents({
-        "resenas.contenidoEmbedding": {"$exists": True}
-    })
+    usuarios_con_resenas = _facet_value("con_resenas")
+    total_resenas = _facet_value("total_resenas")
+    usuarios_con_embeddings = _facet_value("con_embeddings")
+    dim_resenas = _facet_value("dimension")
     
     print(f"  Usuarios totales: {total_usuarios}")
     print(f"  Usuarios con reseñas: {usuarios_con_resenas}")
@@ -79,16 +108,9 @@ def verify_embeddings(db):
     
     if usuarios_con_embeddings > 0:
         # Verificar dimensión del embedding de una reseña
-        usuario_sample = usuarios_col.find_one({
-            "resenas.contenidoEmbedding": {"$exists": True}
-        })
-        if usuario_sample and "resenas" in usuario_sample and len(usuario_sample["resenas"]) > 0:
-            if "contenidoEmbedding" in usuario_sample["resenas"][0]:
-                dim = len(usuario_sample["resenas"][0]["contenidoEmbedding"])
-                print(f"  Dimensión de embeddings: {dim}")
-                print(f"  ✓ Embeddings de reseñas OK")
-            else:
-                print(f"  ⚠ No se pudo verificar la dimensión")
+        if dim_resenas:
+            print(f"  Dimensión de embeddings: {dim_resenas}")
+            print(f"  ✓ Embeddings de reseñas OK")
         else:
             print(f"  ⚠ No se pudo verificar la dimensión")
     else:
@@ -235,8 +257,10 @@ def show_statistics(db):
         print(f"    {idioma:5s}: {cantidad:4d} ({porcentaje:5.1f}%)")
     
     # Compras verificadas
+    # El primer $match usa el índice resenas.compraVerificada y descarta usuarios
+    # sin compras verificadas antes del $unwind; el segundo filtra cada reseña
     pipeline = [
-        {"$match": {"resenas": {"$exists": True, "$ne": []}}},
+        {"$match": {"resenas.compraVerificada": True}},
         {"$unwind": "$resenas"},
         {"$match": {"resenas.compraVerificada": True}},
         {"$count": "total"}
@@ -250,7 +274,7 @@ def show_statistics(db):
     print("\n  Estadísticas de imágenes:")
     imagenes_col = db[COLLECTIONS['IMAGENES']]
     
-    total_imagenes = imagenes_col.count_documents({})
+    total_imagenes = imagenes_col.estimated_document_count()
     print(f"    Total de imágenes: {total_imagenes}")
     
     if total_imagenes > 0:
@@ -290,34 +314,54 @@ def show_sample_data(db):
     
     # Mostrar un producto de ejemplo
     print("\n  Ejemplo de Producto:")
-    producto = db[COLLECTIONS['PRODUCTOS']].find_one()
+    # El vector se reduce a un indicador de presencia en el servidor
+    producto = next(db[COLLECTIONS['PRODUCTOS']].aggregate([
+        {"$limit": 1},
+        {"$addFields": {"tieneEmbedding": {
+            "$gt": [{"$size": {"$ifNull": ["$descripcionEmbedding", []]}}, 0]
+        }}},
+        {"$project": {"descripcionEmbedding": 0}}
+    ]), None)
     if producto:
         print(f"    Código: {producto.get('codigoProducto')}")
         print(f"    Nombre: {producto.get('nombre')}")
         print(f"    Marca: {producto.get('marca', {}).get('nombre')}")
         print(f"    ID Categoría: {producto.get('idCategoria')}")
         print(f"    Precio: ${producto.get('precioUsd')}")
-        print(f"    Embedding: {'✓ Presente' if producto.get('descripcionEmbedding') else '✗ Ausente'}")
+        print(f"    Embedding: {'✓ Presente' if producto.get('tieneEmbedding') else '✗ Ausente'}")
         if producto.get('procesador'):
             print(f"    Especificaciones: procesador={producto.get('procesador')}, RAM={producto.get('memoriaRam')}")
     
     # Mostrar un usuario con reseñas de ejemplo
     print("\n  Ejemplo de Usuario con Reseñas:")
-    usuario = db[COLLECTIONS['USUARIOS']].find_one({"resenas": {"$exists": True, "$ne": []}})
+    usuario = next(db[COLLECTIONS['USUARIOS']].aggregate([
+        {"$match": {"resenas": {"$exists": True, "$ne": []}}},
+        {"$limit": 1},
+        {"$project": {
+            "nombreUsuario": 1,
+            "correo": 1,
+            "compradorVerificado": 1,
+            "numResenas": {"$size": "$resenas"},
+            "primeraResena": {"$arrayElemAt": ["$resenas", 0]}
+        }},
+        {"$addFields": {"primeraResena.tieneEmbedding": {
+            "$gt": [{"$size": {"$ifNull": ["$primeraResena.contenidoEmbedding", []]}}, 0]
+        }}},
+        {"$unset": "primeraResena.contenidoEmbedding"}
+    ]), None)
     if usuario:
         print(f"    Nombre de usuario: {usuario.get('nombreUsuario')}")
         print(f"    Correo: {usuario.get('correo')}")
         print(f"    Comprador verificado: {'Sí' if usuario.get('compradorVerificado') else 'No'}")
-        resenas = usuario.get('resenas', [])
-        if resenas:
-            print(f"    Número de reseñas: {len(resenas)}")
+        resena = usuario.get('primeraResena')
+        if resena:
+            print(f"    Número de reseñas: {usuario.get('numResenas', 0)}")
             print(f"\n    Primera reseña:")
-            resena = resenas[0]
             print(f"      Calificación: {resena.get('calificacion')} ⭐")
             print(f"      Título: {resena.get('titulo')}")
             print(f"      Idioma: {resena.get('idioma')}")
             print(f"      Compra verificada: {'Sí' if resena.get('compraVerificada') else 'No'}")
-            print(f"      Embedding: {'✓ Presente' if resena.get('contenidoEmbedding') else '✗ Ausente'}")
+            print(f"      Embedding: {'✓ Presente' if resena.get('tieneEmbedding') else '✗ Ausente'}")
     
     print()
 
@@ -0,0 +1,87 @@
+"""
+Caché persistente en disco para embeddings de consultas.
+
+Evita recalcular con sentence-transformers o CLIP el embedding de una consulta
+de texto o de una imagen que ya se procesó antes (por ejemplo, al repetir
+búsquedas desde el menú). Los vectores se guardan como bytes float32 en una
+base SQLite, sin pickle.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+from typing import List, Optional
+
+import numpy as np
+
+from config import EMBEDDING_CACHE_DIR, EMBEDDING_CACHE_ENABLED
+
+
+class EmbeddingCache:
+    """Diccionario clave -> vector float32 respaldado por SQLite."""
+
+    def __init__(self, directory: str = EMBEDDING_CACHE_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(directory, "embeddings.sqlite3")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (clave TEXT PRIMARY KEY, vector BLOB NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[List[float]]:
+        """Retorna el vector almacenado o None si no existe."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embeddings WHERE clave = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32).tolist()
+
+    def set(self, key: str, vector: List[float]) -> List[float]:
+        """Guarda el vector y lo retorna (permite `cache.get(k) or cache.set(k, v)`)."""
+        blob = np.asarray(vector, dtype=np.float32).tobytes()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO embeddings (clave, vector) VALUES (?, ?)", (key, blob)
+            )
+            self._conn.commit()
+        return vector
+
+
+def text_key(model_name: str, text: str) -> str:
+    """Clave de caché para un texto codificado con el modelo indicado."""
+    return hashlib.sha256(f"{model_name}|{text}".encode("utf-8")).hexdigest()
+
+
+def image_key(model_name: str, image_bytes: bytes) -> str:
+    """Clave de caché para el contenido binario de una imagen."""
+    digest = hashlib.sha256(model_name.encode("utf-8") + b"|")
+    digest.update(image_bytes)
+    return digest.hexdigest()
+
+
+# Singleton de la caché (None si está deshabilitada o no se pudo abrir)
+_embedding_cache = None
+_embedding_cache_checked = False
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """
+    Obtiene la caché de embeddings (singleton).
+
+    Returns:
+        EmbeddingCache, o None si RAG_EMBED_CACHE=0 o el directorio no es escribible
+    """
+    global _embedding_cache, _embedding_cache_checked
+    if not _embedding_cache_checked:
+        _embedding_cache_checked = True
+        if EMBEDDING_CACHE_ENABLED:
+            try:
+                _embedding_cache = EmbeddingCache()
+            except (OSError, sqlite3.Error) as e:
+                print(f"⚠ Caché de embeddings deshabilitada: {str(e)}")
+    return _embedding_cache
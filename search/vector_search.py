@@ -4,13 +4,28 @@ Extraído y adaptado del web_app.py existente.
 """
 
 import numpy as np
+from dataclasses import dataclass
 from typing import List, Dict, Any, Optional
 from sentence_transformers import SentenceTransformer
 from PIL import Image
 import torch
 import clip
+import io
 import os
-from config import get_database, COLLECTIONS, EMBEDDING_MODEL_NAME
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from config import (
+    get_database,
+    COLLECTIONS,
+    EMBEDDING_MODEL_NAME,
+    LOCAL_INDEX_MAX_DOCS,
+    LOCAL_INDEX_TTL_SECONDS
+)
+from search.embed_cache import get_embedding_cache, text_key, image_key
+
+# Modelo CLIP usado para imágenes (también forma parte de la clave de caché)
+CLIP_MODEL_NAME = "ViT-B/32"
 
 
 # Singletons para modelos
@@ -18,28 +33,101 @@ _embedding_model = None
 _clip_model = None
 _clip_preprocess = None
 
+# Evita cargar dos veces un modelo si la precarga y una búsqueda coinciden
+_text_model_lock = threading.Lock()
+_clip_model_lock = threading.Lock()
+
+# Índice local de productos (ProductIndex) y momento de carga
+_local_index = None
+_local_index_loaded_at = 0.0
+
+# Campos de producto que se devuelven en los resultados (sin el embedding)
+_PRODUCT_FIELDS = {
+    "_id": 0,
+    "idProducto": 1,
+    "codigoProducto": 1,
+    "nombre": 1,
+    "descripcion": 1,
+    "marca": 1,
+    "idCategoria": 1,
+    "precioUsd": 1,
+    "calificacionPromedio": 1,
+    "cantidadResenas": 1,
+    "disponibilidad": 1
+}
 
-def get_embedding_model():
-    """Obtiene el modelo de embeddings de texto (singleton)."""
+
+def get_embedding_model(verbose: bool = True):
+    """
+    Obtiene el modelo de embeddings de texto (singleton).
+    
+    Args:
+        verbose: Mostrar mensajes de carga
+        
+    Returns:
+        SentenceTransformer: Modelo en modo evaluación
+    """
     global _embedding_model
     if _embedding_model is None:
-        print(f"📥 Cargando modelo de texto: {EMBEDDING_MODEL_NAME}")
-        _embedding_model = SentenceTransformer(EMBEDDING_MODEL_NAME)
-        print("✓ Modelo de texto cargado")
+        with _text_model_lock:
+            if _embedding_model is None:
+                if verbose:
+                    print(f"📥 Cargando modelo de texto: {EMBEDDING_MODEL_NAME}")
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                model = SentenceTransformer(EMBEDDING_MODEL_NAME, device=device)
+                model.eval()
+                _embedding_model = model
+                if verbose:
+                    print("✓ Modelo de texto cargado")
     return _embedding_model
         
 
-def get_clip_model():
-    """Obtiene el modelo CLIP para imágenes (singleton)."""
+def get_clip_model(verbose: bool = True):
+    """
+    Obtiene el modelo CLIP para imágenes (singleton).
+    
+    Args:
+        verbose: Mostrar mensajes de carga
+        
+    Returns:
+        Tupla (modelo, preprocess) con el modelo en modo evaluación
+    """
     global _clip_model, _clip_preprocess
     if _clip_model is None:
-        print("📥 Cargando modelo CLIP para imágenes...")
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        _clip_model, _clip_preprocess = clip.load("ViT-B/32", device=device)
-        print("✓ Modelo CLIP cargado")
+        with _clip_model_lock:
+            if _clip_model is None:
+                if verbose:
+                    print("📥 Cargando modelo CLIP para imágenes...")
+                device = "cuda" if torch.cuda.is_available() else "cpu"
+                model, preprocess = clip.load(CLIP_MODEL_NAME, device=device)
+                model.eval()
+                _clip_preprocess = preprocess
+                _clip_model = model
+                if verbose:
+                    print("✓ Modelo CLIP cargado")
     return _clip_model, _clip_preprocess
 
 
+def preload_models(verbose: bool = False):
+    """
+    Carga los modelos de texto y CLIP por adelantado.
+    
+    Pensado para ejecutarse en un hilo en segundo plano al iniciar la
+    aplicación: la primera búsqueda encuentra los modelos ya en memoria.
+    Los errores se ignoran; la búsqueda volverá a intentar la carga y
+    mostrará el error al usuario.
+    
+    Args:
+        verbose: Mostrar mensajes de carga
+    """
+    for loader in (get_embedding_model, get_clip_model):
+        try:
+            loader(verbose=verbose)
+        except Exception as e:
+            if verbose:
+                print(f"⚠ No se pudo precargar el modelo: {str(e)}")
+
+
 def generate_text_embedding(text: str) -> List[float]:
     """
     Genera embedding para texto.
@@ -50,9 +138,80 @@ def generate_text_embedding(text: str) -> List[float]:
     Returns:
         Vector de embedding (384 dimensiones)
     """
+    cache = get_embedding_cache()
+    key = text_key(EMBEDDING_MODEL_NAME, text)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
     model = get_embedding_model()
-    embedding = model.encode(text)
-    return embedding.tolist()
+    embedding = model.encode(text).tolist()
+    
+    if cache is not None:
+        cache.set(key, embedding)
+    return embedding
+
+
+def generate_text_embeddings(texts: List[str]) -> List[List[float]]:
+    """
+    Genera embeddings para varios textos con una sola pasada del modelo.
+    
+    Los textos que ya están en la caché no se vuelven a codificar.
+    
+    Args:
+        texts: Textos de entrada
+        
+    Returns:
+        Lista de vectores (384 dimensiones), en el mismo orden que texts
+    """
+    cache = get_embedding_cache()
+    keys = [text_key(EMBEDDING_MODEL_NAME, text) for text in texts]
+    embeddings = [cache.get(key) if cache is not None else None for key in keys]
+    
+    pendientes = [i for i, embedding in enumerate(embeddings) if embedding is None]
+    if pendientes:
+        model = get_embedding_model()
+        nuevos = model.encode([texts[i] for i in pendientes], batch_size=32, convert_to_numpy=True)
+        for i, vector in zip(pendientes, nuevos):
+            embeddings[i] = vector.tolist()
+            if cache is not None:
+                cache.set(keys[i], embeddings[i])
+    
+    return embeddings
+
+
+def generate_image_embedding(image_bytes: bytes) -> List[float]:
+    """
+    Genera embedding CLIP normalizado para el contenido de una imagen.
+    
+    Args:
+        image_bytes: Contenido binario de la imagen
+        
+    Returns:
+        Vector de embedding (512 dimensiones)
+    """
+    cache = get_embedding_cache()
+    key = image_key(CLIP_MODEL_NAME, image_bytes)
+    if cache is not None:
+        cached = cache.get(key)
+        if cached is not None:
+            return cached
+    
+    clip_model, preprocess = get_clip_model()
+    device = next(clip_model.parameters()).device
+    
+    image = Image.open(io.BytesIO(image_bytes)).convert('RGB')
+    image_tensor = preprocess(image).unsqueeze(0).to(device)
+    
+    with torch.no_grad():
+        image_embedding = clip_model.encode_image(image_tensor)
+        image_embedding = image_embedding / image_embedding.norm(dim=-1, keepdim=True)
+        image_embedding = image_embedding.cpu().numpy().flatten().tolist()
+    
+    if cache is not None:
+        cache.set(key, image_embedding)
+    return image_embedding
 
 
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
@@ -78,12 +237,131 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
     return float(np.dot(a, b) / (norm_a * norm_b))
 
 
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Normaliza cada fila a norma L2 = 1 (las filas nulas quedan en cero)."""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _cosine_scores(matrix: np.ndarray, query: List[float]) -> np.ndarray:
+    """
+    Similitud coseno de una consulta contra todas las filas de una matriz
+    ya normalizada, en una sola multiplicación matriz-vector (BLAS).
+    """
+    q = np.asarray(query, dtype=np.float32)
+    norm = np.linalg.norm(q)
+    if norm == 0:
+        return np.zeros(len(matrix), dtype=np.float32)
+    return matrix @ (q / norm)
+
+
+def _top_indices(scores: np.ndarray, limit: Optional[int]) -> np.ndarray:
+    """Índices de los mejores scores en orden descendente (top-k con argpartition)."""
+    if limit is not None and 0 < limit < len(scores):
+        top = np.argpartition(-scores, limit - 1)[:limit]
+        return top[np.argsort(-scores[top])]
+    return np.argsort(-scores)
+
+
+@dataclass
+class ProductIndex:
+    """
+    Índice local de productos con layout SoA (struct of arrays).
+    
+    Cada posición i de los arreglos corresponde al mismo producto: los filtros
+    se evalúan como máscaras booleanas sobre arreglos contiguos y solo las
+    filas candidatas entran en el producto matriz-vector.
+    """
+    embeddings: np.ndarray   # (N, D) float32, filas normalizadas
+    categorias: np.ndarray   # (N,) idCategoria (object: conserva el tipo almacenado)
+    precios: np.ndarray      # (N,) float64 (igual que en BSON), NaN si no hay precio
+    productos: List[Dict[str, Any]]  # Metadatos devueltos en los resultados
+    
+    def __len__(self):
+        return len(self.productos)
+    
+    def filter_mask(self, category_filter=None, price_range=None) -> np.ndarray:
+        """Máscara booleana con los mismos filtros que la consulta a MongoDB."""
+        mask = np.ones(len(self), dtype=bool)
+        if category_filter:
+            mask &= self.categorias == category_filter
+        if price_range:
+            min_price, max_price = price_range
+            # Las comparaciones con NaN son False: sin precio queda excluido
+            if min_price is not None:
+                mask &= self.precios >= min_price
+            if max_price is not None:
+                mask &= self.precios <= max_price
+        return mask
+
+
+def _load_local_index(collection):
+    """
+    Obtiene el índice local de productos, cargándolo de MongoDB si hace falta.
+    
+    Los embeddings se leen una vez, se apilan en una matriz float32 contigua
+    normalizada y se reutilizan durante LOCAL_INDEX_TTL_SECONDS.
+    
+    Returns:
+        ProductIndex o None si la colección es demasiado grande
+    """
+    global _local_index, _local_index_loaded_at
+    
+    if _local_index is not None and time.monotonic() - _local_index_loaded_at < LOCAL_INDEX_TTL_SECONDS:
+        return _local_index
+    
+    if collection.estimated_document_count() > LOCAL_INDEX_MAX_DOCS:
+        _local_index = None
+        return None
+    
+    documentos = []
+    vectores = []
+    for prod in collection.find(
+        {"descripcionEmbedding": {"$exists": True, "$ne": []}},
+        {**_PRODUCT_FIELDS, "descripcionEmbedding": 1}
+    ):
+        vectores.append(prod.pop("descripcionEmbedding"))
+        documentos.append(prod)
+    
+    n = len(documentos)
+    if vectores:
+        matriz = _normalize_rows(np.asarray(vectores, dtype=np.float32))
+    else:
+        matriz = np.empty((0, 0), dtype=np.float32)
+    
+    categorias = np.empty(n, dtype=object)
+    categorias[:] = [prod.get("idCategoria") for prod in documentos]
+    precios = np.fromiter(
+        (np.nan if prod.get("precioUsd") is None else prod["precioUsd"] for prod in documentos),
+        dtype=np.float64,
+        count=n
+    )
+    
+    _local_index = ProductIndex(
+        embeddings=matriz,
+        categorias=categorias,
+        precios=precios,
+        productos=documentos
+    )
+    _local_index_loaded_at = time.monotonic()
+    print(f"✓ Índice local de productos cargado ({len(documentos)} vectores)")
+    return _local_index
+
+
+def invalidate_local_index():
+    """Descarta el índice local (por ejemplo, tras recargar los productos)."""
+    global _local_index
+    _local_index = None
+
+
 def search_productos(
     query: str,
     limit: int = 10,
     min_score: float = 0.3,
     category_filter: Optional[str] = None,
-    price_range: Optional[tuple] = None
+    price_range: Optional[tuple] = None,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict[str, Any]]:
     """
     Búsqueda semántica de productos usando embeddings.
@@ -94,6 +372,7 @@ def search_productos(
         min_score: Score mínimo de similitud (0-1)
         category_filter: Filtro opcional por categoría
         price_range: Tupla (min_price, max_price) opcional
+        query_embedding: Embedding ya calculado de la consulta (opcional)
         
     Returns:
         Lista de productos ordenados por relevancia
@@ -103,8 +382,31 @@ def search_productos(
     
     print(f"\n🔍 Buscando productos: '{query}'")
     
-    # Generar embedding de la consulta
-    query_embedding = generate_text_embedding(query)
+    # Generar embedding de la consulta (si no se recibió precalculado)
+    if query_embedding is None:
+        query_embedding = generate_text_embedding(query)
+    
+    # Camino rápido: puntuar contra la matriz en memoria
+    index = _load_local_index(collection)
+    if index is not None:
+        # Filtros como máscaras vectorizadas, antes del producto matriz-vector
+        candidatos = np.flatnonzero(index.filter_mask(category_filter, price_range))
+        
+        print(f"📊 Analizando {len(candidatos)} productos...")
+        
+        resultados = []
+        if len(candidatos):
+            scores = _cosine_scores(index.embeddings[candidatos], query_embedding)
+            validos = scores >= min_score
+            candidatos, scores = candidatos[validos], scores[validos]
+            
+            for pos in _top_indices(scores, limit):
+                prod = dict(index.productos[candidatos[pos]])
+                prod["search_score"] = float(scores[pos])
+                resultados.append(prod)
+        
+        print(f"✓ Encontrados {len(resultados)} productos relevantes")
+        return resultados
     
     # Construir filtros adicionales
     filters = {"descripcionEmbedding": {"$exists": True}}
@@ -167,7 +469,8 @@ def search_resenas(
     query: str,
     limit: int = 10,
     min_score: float = 0.3,
-    verified_only: bool = False
+    verified_only: bool = False,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict[str, Any]]:
     """
     Búsqueda semántica en reseñas.
@@ -177,6 +480,7 @@ def search_resenas(
         limit: Número máximo de resultados
         min_score: Score mínimo de similitud
         verified_only: Solo compradores verificados
+        query_embedding: Embedding ya calculado de la consulta (opcional)
         
     Returns:
         Lista de reseñas ordenadas por relevancia
@@ -185,7 +489,8 @@ def search_resenas(
     collection = db[COLLECTIONS['USUARIOS']]
     
     print(f"\n🔍 Buscando reseñas: '{query}'")
-    query_embedding = generate_text_embedding(query)
+    if query_embedding is None:
+        query_embedding = generate_text_embedding(query)
     
     # Construir filtros
     filters = {"resenas": {"$exists": True, "$ne": []}}
@@ -236,7 +541,8 @@ def search_by_image(
     image_path: str,
     search_type: str = "productos",
     limit: int = 5,
-    include_reviews: bool = True
+    include_reviews: bool = True,
+    image_embedding: Optional[List[float]] = None
 ) -> Dict[str, Any]:
     """
     Búsqueda por imagen usando CLIP.
@@ -246,27 +552,22 @@ def search_by_image(
         search_type: "productos" o "general"
         limit: Número de resultados
         include_reviews: Incluir reseñas relacionadas
+        image_embedding: Embedding CLIP ya calculado de la imagen (opcional)
         
     Returns:
         Diccionario con resultados y reseñas opcionales
     """
     try:
-        # Cargar modelo CLIP
-        clip_model, preprocess = get_clip_model()
-        device = next(clip_model.parameters()).device
-        
-        # Procesar imagen
-        if not os.path.exists(image_path):
-            return {"error": f"Imagen no encontrada: {image_path}"}
-        
-        image = Image.open(image_path).convert('RGB')
-        image_tensor = preprocess(image).unsqueeze(0).to(device)
-        
-        # Generar embedding de imagen
-        with torch.no_grad():
-            image_embedding = clip_model.encode_image(image_tensor)
-            image_embedding = image_embedding / image_embedding.norm(dim=-1, keepdim=True)
-            image_embedding = image_embedding.cpu().numpy().flatten().tolist()
+        if image_embedding is None:
+            # Leer imagen
+            if not os.path.exists(image_path):
+                return {"error": f"Imagen no encontrada: {image_path}"}
+            
+            with open(image_path, 'rb') as f:
+                image_bytes = f.read()
+            
+            # Generar embedding de imagen (CLIP solo se carga si no está en caché)
+            image_embedding = generate_image_embedding(image_bytes)
         
         print(f"🖼️ Analizando imagen: {os.path.basename(image_path)}")
         
@@ -287,19 +588,20 @@ def search_by_image(
             }
         ))
         
-        # Calcular similitudes
+        # Calcular similitudes con una sola multiplicación matriz-vector
         resultados_imagenes = []
-        for img in imagenes:
-            if "clipEmbedding" in img:
-                similarity = cosine_similarity(image_embedding, img["clipEmbedding"])
-                if similarity > 0.1:  # Umbral bajo para imágenes
-                    del img["clipEmbedding"]
-                    img["similarity_score"] = similarity
-                    resultados_imagenes.append(img)
-        
-        # Ordenar por similitud
-        resultados_imagenes.sort(key=lambda x: x["similarity_score"], reverse=True)
-        resultados_imagenes = resultados_imagenes[:limit]
+        if imagenes:
+            matriz = _normalize_rows(np.asarray(
+                [img.pop("clipEmbedding") for img in imagenes], dtype=np.float32
+            ))
+            scores = _cosine_scores(matriz, image_embedding)
+            
+            for pos in _top_indices(scores, limit):
+                if scores[pos] <= 0.1:  # Umbral bajo para imágenes
+                    break
+                img = imagenes[pos]
+                img["similarity_score"] = float(scores[pos])
+                resultados_imagenes.append(img)
         
         # Obtener información de productos
         productos_similares = []
@@ -377,19 +679,49 @@ def hybrid_search(
         "productos_combinados": []
     }
     
-    # Búsqueda por texto
-    if text_query:
-        resultados["productos_texto"] = search_productos(
-            text_query, 
-            limit=limit,
-            category_filter=filters.get("category") if filters else None,
-            price_range=filters.get("price_range") if filters else None
-        )
-    
-    # Búsqueda por imagen
-    if image_path:
-        resultado_imagen = search_by_image(image_path, limit=limit)
-        resultados["productos_imagen"] = resultado_imagen.get("productos_similares", [])
+    # Codificar cada modalidad una sola vez, antes de consultar MongoDB
+    text_embedding = generate_text_embedding(text_query) if text_query else None
+    image_embedding = None
+    imagen_valida = bool(image_path)
+    if image_path and os.path.exists(image_path):
+        try:
+            with open(image_path, 'rb') as f:
+                image_embedding = generate_image_embedding(f.read())
+        except Exception as e:
+            # Igual que en search_by_image: la parte de imagen queda vacía y
+            # se devuelven igualmente los resultados de texto
+            print(f"❌ Error en búsqueda por imagen: {str(e)}")
+            imagen_valida = False
+    
+    # Las dos búsquedas solo esperan a MongoDB: se ejecutan en paralelo
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futuro_texto = None
+        futuro_imagen = None
+        
+        if text_query:
+            futuro_texto = executor.submit(
+                search_productos,
+                text_query,
+                limit=limit,
+                category_filter=filters.get("category") if filters else None,
+                price_range=filters.get("price_range") if filters else None,
+                query_embedding=text_embedding
+            )
+        
+        if imagen_valida:
+            # Las reseñas relacionadas no forman parte del resultado híbrido
+            futuro_imagen = executor.submit(
+                search_by_image,
+                image_path,
+                limit=limit,
+                include_reviews=False,
+                image_embedding=image_embedding
+            )
+        
+        if futuro_texto is not None:
+            resultados["productos_texto"] = futuro_texto.result()
+        if futuro_imagen is not None:
+            resultados["productos_imagen"] = futuro_imagen.result().get("productos_similares", [])
     
     # Combinar resultados si hay ambas búsquedas
     if text_query and image_path:
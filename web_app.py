@@ -16,20 +16,77 @@ from PIL import Image
 from openai import OpenAI
 import gridfs
 from bson import ObjectId
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+# Atlas admite como máximo 10000 candidatos por etapa $vectorSearch
+_MAX_NUM_CANDIDATES = 10000
+
+
+def num_candidates_for(limit):
+    """
+    Calcula numCandidates para una etapa $vectorSearch según su limit.
+    
+    Con pocos resultados bastan ~10 candidatos por resultado; a partir de
+    ahí se usan 20 (mínimo 100, máximo 2000) y, con limit grandes, al menos
+    4 por resultado. El valor nunca disminuye al aumentar limit.
+    
+    Args:
+        limit: Valor de 'limit' de la etapa $vectorSearch
+        
+    Returns:
+        int: Número de candidatos (nunca menor que limit)
+    """
+    if limit <= 5:
+        candidatos = 10 * limit
+    else:
+        candidatos = max(100, min(2000, 20 * limit), 4 * limit)
+    return min(_MAX_NUM_CANDIDATES, max(candidatos, limit))
+
 
 app = Flask(__name__)
+
+# Vocabulario para detectar consultas orientadas a precio (compilado una sola vez)
+_PRICE_QUERY_RE = re.compile('|'.join(map(re.escape, [
+    'caro', 'caros', 'cara', 'caras', 'costoso', 'costosos', 'precio', 'expensive', 'más caro', 'mas caro'
+])))
+_CHEAP_QUERY_RE = re.compile('|'.join(map(re.escape, [
+    'barato', 'baratos', 'barata', 'baratas', 'económico', 'cheap', 'menos caro', 'más barato', 'mas barato'
+])))
+
+# Proyección que excluye los vectores (384/512 floats) de las respuestas que no los usan
+_SIN_EMBEDDINGS = {
+    'descripcion_embedding': 0,
+    'descripcionEmbedding': 0,
+    'imagen_embedding_clip': 0,
+    'clipEmbedding': 0
+}
+
+# Consultas de /rag/batch procesadas en paralelo (cada una espera a Groq)
+RAG_BATCH_WORKERS = 4
+
+# Máximo de consultas aceptadas en una sola petición a /rag/batch
+RAG_BATCH_MAX_QUERIES = 20
+
+# Tope de max_products / max_reviews por consulta en /rag/batch
+RAG_BATCH_MAX_RESULTS = 20
+
 CORS(app)
 
+# Directorio de imágenes servidas en /images (resuelto una vez al importar)
+_IMAGES_DIR = os.environ.get('RAG_IMAGES_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'images'))
+
 @app.route('/images/<filename>')
 def serve_image(filename):
     """Servir imágenes estáticas desde el directorio data/images."""
-    images_dir = os.path.join(os.path.dirname(__file__), 'data', 'images')
-    return send_from_directory(images_dir, filename)
+    return send_from_directory(_IMAGES_DIR, filename)
 
 # Variables globales para modelos de embeddings
 _embedding_model = None
 _clip_model = None
 _clip_processor = None
+_clip_device = None
+_clip_available = None  # None: aún no comprobado
 
 # Cliente Groq (OpenAI API compatible)
 _groq_client = None
@@ -64,7 +121,11 @@ def get_clip_model():
     Carga el modelo CLIP para embeddings multimodales (singleton).
     Retorna (modelo, procesador, device).
     """
-    global _clip_model, _clip_processor
+    global _clip_model, _clip_processor, _clip_device, _clip_available
+    
+    # La disponibilidad se comprueba una sola vez por proceso
+    if _clip_available is False:
+        return None, None, None
     
     if _clip_model is None:
         try:
@@ -77,17 +138,17 @@ def get_clip_model():
             
             _clip_model = CLIPModel.from_pretrained(model_name).to(device)
             _clip_processor = CLIPProcessor.from_pretrained(model_name)
+            _clip_device = device
+            _clip_available = True
             
             print(f"✓ Modelo CLIP cargado correctamente (device: {device})")
-            return _clip_model, _clip_processor, device
             
         except ImportError:
             print("⚠️ CLIP no disponible. Instala: pip install torch transformers")
+            _clip_available = False
             return None, None, None
     
-    import torch
-    device = "cuda" if torch.cuda.is_available() else "cpu"
-    return _clip_model, _clip_processor, device
+    return _clip_model, _clip_processor, _clip_device
 
 
 def generate_embedding(text):
@@ -166,6 +227,28 @@ def cosine_similarity(vec1, vec2):
     return float(similarity)
 
 
+def cosine_similarity_batch(query_vec, vectors):
+    """
+    Calcula la similitud coseno de una consulta contra muchos vectores a la vez.
+    
+    Args:
+        query_vec: Vector de la consulta
+        vectors: Lista de vectores de la misma dimensión
+    
+    Returns:
+        list: Similitudes (float) en el mismo orden que vectors
+    """
+    if not vectors:
+        return []
+    
+    matriz = np.asarray(vectors, dtype=np.float32)
+    consulta = np.asarray(query_vec, dtype=np.float32)
+    
+    normas = np.linalg.norm(matriz, axis=1) * np.linalg.norm(consulta)
+    normas[normas == 0] = 1.0
+    return ((matriz @ consulta) / normas).tolist()
+
+
 def show_results(docs, fs):
     """
     Muestra resultados de búsqueda con scores y metadatos.
@@ -304,7 +387,8 @@ Responde en español de manera profesional pero amigable.
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": full_prompt}
             ],
-            temperature=0.4,
+            temperature=0.0,  # Respuestas deterministas (reproducibles y cacheables)
+            seed=42,
             max_tokens=800
         )
         
@@ -391,98 +475,99 @@ def search_products(query, limit=10):
         query_words = query_lower.split()
         
         # Detectar consultas de precios/ranking
-        is_price_query = any(word in query_lower for word in ['caro', 'caros', 'cara', 'caras', 'costoso', 'costosos', 'precio', 'expensive', 'más caro', 'mas caro'])
-        is_cheap_query = any(word in query_lower for word in ['barato', 'baratos', 'barata', 'baratas', 'económico', 'cheap', 'menos caro', 'más barato', 'mas barato'])
+        is_price_query = _PRICE_QUERY_RE.search(query_lower) is not None
+        is_cheap_query = _CHEAP_QUERY_RE.search(query_lower) is not None
+        
+        # 1. Similitud semántica (embedding) de todos los productos en una sola operación matricial
+        productos = [p for p in productos if p.get("descripcionEmbedding")]
+        semantic_scores = np.asarray(cosine_similarity_batch(
+            query_embedding,
+            [p["descripcionEmbedding"] for p in productos]
+        ), dtype=np.float64)
+        
+        # Componentes léxicos y de precio por producto (operaciones de texto)
+        keyword_scores = np.zeros(len(productos))
+        exact_boosts = np.zeros(len(productos))
+        price_boosts = np.zeros(len(productos))
+        
+        for idx, producto in enumerate(productos):
+            # 2. Puntuación por coincidencia exacta de palabras clave
+            # Cada campo se pasa a minúsculas una sola vez por producto
+            nombre_lower = producto.get("nombre", "").lower()
+            categoria_lower = str(producto.get("categoria", {}).get("nombre", "")).lower()
+            combined_text = " ".join([
+                nombre_lower,
+                producto.get("descripcion", "").lower(),
+                categoria_lower,
+                str(producto.get("marca", {}).get("nombre", "")).lower()
+            ])
+            
+            # Puntuación por coincidencias exactas, normalizada por número de palabras
+            if query_words:
+                keyword_scores[idx] = sum(1 for word in query_words if word in combined_text) / len(query_words)
+            
+            # 3. Boost especial para coincidencias exactas en nombre o categoría
+            if query_lower in nombre_lower:
+                exact_boosts[idx] = 0.3
+            elif query_lower in categoria_lower:
+                exact_boosts[idx] = 0.25
+            
+            # 4. Boost especial para consultas de precios
+            precio_producto = (
+                producto.get("precioUsd") or 
+                producto.get("metadata", {}).get("precio_usd") or 
+                producto.get("precio_usd", 0)
+            )
+            
+            if is_price_query and precio_producto > 0:
+                # Para consultas de "caros", boost productos con precios altos
+                if precio_producto >= 1000:
+                    price_boosts[idx] = 0.4  # Boost alto para productos premium
+                elif precio_producto >= 500:
+                    price_boosts[idx] = 0.2  # Boost medio para productos mid-range
+            elif is_cheap_query and precio_producto > 0:
+                # Para consultas de "baratos", boost productos con precios bajos
+                if precio_producto <= 300:
+                    price_boosts[idx] = 0.4
+                elif precio_producto <= 600:
+                    price_boosts[idx] = 0.2
+        
+        # 5. Combinar puntuaciones (pesos ajustados para incluir precio) en NumPy
+        # Semantic: 50%, Keywords: 25%, Exact Match: 10%, Price: 15%
+        hybrid_scores = (
+            semantic_scores * 0.5 +
+            keyword_scores * 0.25 +
+            exact_boosts * 0.1 +
+            price_boosts * 0.15
+        )
         
-        # Calcular similitudes híbridas
-        resultados = []
-        for producto in productos:
-            if "descripcionEmbedding" in producto and producto["descripcionEmbedding"]:
-                # 1. Similitud semántica (embedding)
-                semantic_similarity = cosine_similarity(query_embedding, producto["descripcionEmbedding"])
-                
-                # 2. Puntuación por coincidencia exacta de palabras clave
-                keyword_score = 0
-                text_fields = [
-                    producto.get("nombre", "").lower(),
-                    producto.get("descripcion", "").lower(),
-                    str(producto.get("categoria", {}).get("nombre", "")).lower(),
-                    str(producto.get("marca", {}).get("nombre", "")).lower()
-                ]
-                combined_text = " ".join(text_fields)
-                
-                # Puntuación por coincidencias exactas
-                for word in query_words:
-                    if word in combined_text:
-                        keyword_score += 1
-                
-                # Normalizar keyword_score
-                keyword_score = keyword_score / len(query_words) if query_words else 0
-                
-                # 3. Boost especial para coincidencias exactas en nombre o categoría
-                exact_match_boost = 0
-                if query_lower in producto.get("nombre", "").lower():
-                    exact_match_boost = 0.3
-                elif query_lower in str(producto.get("categoria", {}).get("nombre", "")).lower():
-                    exact_match_boost = 0.25
-                
-                # 4. Boost especial para consultas de precios
-                price_boost = 0
-                precio_producto = (
-                    producto.get("precioUsd") or 
-                    producto.get("metadata", {}).get("precio_usd") or 
-                    producto.get("precio_usd", 0)
-                )
-                
-                if is_price_query and precio_producto > 0:
-                    # Para consultas de "caros", boost productos con precios altos
-                    if precio_producto >= 1000:
-                        price_boost = 0.4  # Boost alto para productos premium
-                    elif precio_producto >= 500:
-                        price_boost = 0.2  # Boost medio para productos mid-range
-                elif is_cheap_query and precio_producto > 0:
-                    # Para consultas de "baratos", boost productos con precios bajos
-                    if precio_producto <= 300:
-                        price_boost = 0.4
-                    elif precio_producto <= 600:
-                        price_boost = 0.2
-                
-                # 5. Combinar puntuaciones (pesos ajustados para incluir precio)
-                # Semantic: 50%, Keywords: 25%, Exact Match: 10%, Price: 15%
-                hybrid_score = (
-                    semantic_similarity * 0.5 + 
-                    keyword_score * 0.25 + 
-                    exact_match_boost * 0.1 +
-                    price_boost * 0.15
-                )
-                
-                similarity = hybrid_score
-                
-                # Solo procesar productos con similitud mínima
-                if similarity >= 0.1:
-                    precio_producto = producto.get("precioUsd", 0)
-                    
-                    producto_info = {
-                        "id": str(producto.get("_id")),
-                        "codigo_producto": producto.get("codigoProducto", ""),
-                        "nombre": producto.get("nombre", ""),
-                        "descripcion": producto.get("descripcion", ""),
-                        "marca": producto.get("marca", {}),
-                        "categoria": producto.get("categoria", {}),
-                        "precio_usd": precio_producto,
-                        "calificacion": producto.get("calificacionPromedio", 0),
-                        "disponibilidad": producto.get("disponibilidad", ""),
-                        "imagen_principal": producto.get("imagen_principal", ""),
-                        "similarity": round(similarity, 4),
-                        "semantic_score": round(semantic_similarity, 4),
-                        "keyword_score": round(keyword_score, 4),
-                        "exact_match_boost": round(exact_match_boost, 4),
-                        "price_boost": round(price_boost, 4)
-                    }
-                    resultados.append(producto_info)
+        # Solo productos con similitud mínima, ordenados por similitud descendente
+        candidatos = np.flatnonzero(hybrid_scores >= 0.1)
+        orden = candidatos[np.argsort(-hybrid_scores[candidatos], kind="stable")]
+        if limit > 0:
+            # Solo se formatean los que se devuelven (y los 5 del log de depuración)
+            orden = orden[:max(limit, 5)]
         
-        # Ordenar por similitud descendente
-        resultados.sort(key=lambda x: x["similarity"], reverse=True)
+        resultados = []
+        for idx in orden:
+            producto = productos[idx]
+            resultados.append({
+                "id": str(producto.get("_id")),
+                "codigo_producto": producto.get("codigoProducto", ""),
+                "nombre": producto.get("nombre", ""),
+                "descripcion": producto.get("descripcion", ""),
+                "marca": producto.get("marca", {}),
+                "categoria": producto.get("categoria", {}),
+                "precio_usd": producto.get("precioUsd", 0),
+                "calificacion": producto.get("calificacionPromedio", 0),
+                "disponibilidad": producto.get("disponibilidad", ""),
+                "imagen_principal": producto.get("imagen_principal", ""),
+                "similarity": round(float(hybrid_scores[idx]), 4),
+                "semantic_score": round(float(semantic_scores[idx]), 4),
+                "keyword_score": round(float(keyword_scores[idx]), 4),
+                "exact_match_boost": round(float(exact_boosts[idx]), 4),
+                "price_boost": round(float(price_boosts[idx]), 4)
+            })
         
         # Debug: mostrar top 5 resultados con puntuaciones
         print(f"🎯 Top 5 resultados para '{query}':")
@@ -523,24 +608,32 @@ def search_reviews(query, limit=5):
             "resenas": {"$exists": True, "$ne": []}
         }))
         
-        # Calcular similitudes para reseñas
+        # Reseñas con embedding, emparejadas con su usuario
+        pares = [
+            (usuario, resena)
+            for usuario in usuarios
+            for resena in usuario.get("resenas", [])
+            if resena.get("contenidoEmbedding")
+        ]
+        
+        # Calcular similitudes para todas las reseñas en una sola operación matricial
+        similitudes = cosine_similarity_batch(
+            query_embedding,
+            [resena["contenidoEmbedding"] for _, resena in pares]
+        )
+        
         resultados = []
-        for usuario in usuarios:
-            if "resenas" in usuario:
-                for resena in usuario["resenas"]:
-                    if "contenidoEmbedding" in resena and resena["contenidoEmbedding"]:
-                        similarity = cosine_similarity(query_embedding, resena["contenidoEmbedding"])
-                        
-                        resena_info = {
-                            "usuario": usuario.get("nombreUsuario", ""),
-                            "titulo": resena.get("titulo", ""),
-                            "contenido": resena.get("contenido", ""),
-                            "calificacion": resena.get("calificacion", 0),
-                            "id_producto": str(resena.get("idProducto", resena.get("id_producto", ""))),
-                            "compra_verificada": resena.get("compraVerificada", resena.get("compra_verificada", False)),
-                            "similarity": round(similarity, 4)
-                        }
-                        resultados.append(resena_info)
+        for (usuario, resena), similarity in zip(pares, similitudes):
+            resena_info = {
+                "usuario": usuario.get("nombreUsuario", ""),
+                "titulo": resena.get("titulo", ""),
+                "contenido": resena.get("contenido", ""),
+                "calificacion": resena.get("calificacion", 0),
+                "id_producto": str(resena.get("idProducto", resena.get("id_producto", ""))),
+                "compra_verificada": resena.get("compraVerificada", resena.get("compra_verificada", False)),
+                "similarity": round(similarity, 4)
+            }
+            resultados.append(resena_info)
         
         # Ordenar por similitud descendente
         resultados.sort(key=lambda x: x["similarity"], reverse=True)
@@ -645,9 +738,9 @@ def api_products_search():
             {
                 '$vectorSearch': {
                     'index': 'idx_descripcion_vector',  # Índice vectorial en MongoDB Atlas
-                    'path': 'descripcion_embedding',
+                    'path': 'descripcionEmbedding',
                     'queryVector': query_embedding,
-                    'numCandidates': limit * 10,  # Candidatos a evaluar
+                    'numCandidates': num_candidates_for(limit * 3),  # Candidatos a evaluar
                     'limit': limit * 3  # Obtener más para aplicar filtros
                 }
             },
@@ -676,13 +769,13 @@ def api_products_search():
         pipeline.append({
             '$project': {
                 '_id': 0,
-                'codigo_producto': 1,
+                'codigoProducto': 1,
                 'nombre': 1,
                 'descripcion': 1,
                 'marca.nombre': 1,
                 'categoria.nombre': 1,
-                'metadata.precio_usd': 1,
-                'metadata.calificacion_promedio': 1,
+                'precioUsd': 1,
+                'calificacionPromedio': 1,
                 'imagen_principal': 1,
                 'similarity_score': 1
             }
@@ -700,13 +793,13 @@ def api_products_search():
             productos_formateados = []
             for p in resultados:
                 productos_formateados.append({
-                    'codigo': p.get('codigo_producto', ''),
+                    'codigo': p.get('codigoProducto', ''),
                     'nombre': p.get('nombre', ''),
                     'descripcion': p.get('descripcion', ''),
                     'marca': p.get('marca', {}).get('nombre', ''),
                     'categoria': p.get('categoria', {}).get('nombre', ''),
-                    'precio_usd': p.get('metadata', {}).get('precio_usd', 0),
-                    'calificacion': p.get('metadata', {}).get('calificacion_promedio', 0),
+                    'precio_usd': p.get('precioUsd', 0),
+                    'calificacion': p.get('calificacionPromedio', 0),
                     'imagen': p.get('imagen_principal', ''),
                     'similarity': round(p.get('similarity_score', 0) * 100, 2)
                 })
@@ -726,12 +819,12 @@ def api_products_search():
             #     filtros_mongo['marca.nombre'] = {'$regex': brand, '$options': 'i'}
             
             # Obtener productos sin filtros y calcular similitud manualmente
-            productos = list(productos_collection.find({}).limit(200))
+            productos = list(productos_collection.find({}, {'imagen_embedding_clip': 0}).limit(200))
             
             productos_con_similitud = []
             for producto in productos:
-                if 'descripcion_embedding' in producto and producto['descripcion_embedding']:
-                    similitud = cosine_similarity(query_embedding, producto['descripcion_embedding'])
+                if producto.get('descripcionEmbedding'):
+                    similitud = cosine_similarity(query_embedding, producto['descripcionEmbedding'])
                     
                     productos_con_similitud.append({
                         'producto': producto,
@@ -746,13 +839,13 @@ def api_products_search():
             for item in productos_con_similitud[:limit]:
                 p = item['producto']
                 productos_formateados.append({
-                    'codigo': p.get('codigo_producto', ''),
+                    'codigo': p.get('codigoProducto', ''),
                     'nombre': p.get('nombre', ''),
                     'descripcion': p.get('descripcion', ''),
                     'marca': p.get('marca', {}).get('nombre', ''),
                     'categoria': p.get('categoria', {}).get('nombre', ''),
-                    'precio_usd': p.get('metadata', {}).get('precio_usd', 0),
-                    'calificacion': p.get('metadata', {}).get('calificacion_promedio', 0),
+                    'precio_usd': p.get('precioUsd', 0),
+                    'calificacion': p.get('calificacionPromedio', 0),
                     'imagen': p.get('imagen_principal', ''),
                     'similarity': round(item['similarity_score'] * 100, 2)
                 })
@@ -850,7 +943,7 @@ def api_products_search_by_image():
                     'index': 'foto_index',  # Índice CLIP (512 dims)
                     'path': 'imagen_embedding_clip',
                     'queryVector': query_embedding,
-                    'numCandidates': limit * 10,
+                    'numCandidates': num_candidates_for(limit * 3),
                     'limit': limit * 3
                 }
             },
@@ -920,7 +1013,7 @@ def api_products_search_by_image():
                             'index': 'foto_index',
                             'path': 'imagen_embedding_clip',
                             'queryVector': query_embedding,
-                            'numCandidates': limit * 10,
+                            'numCandidates': num_candidates_for(limit * 3),
                             'limit': limit * 3
                         }
                     },
@@ -970,7 +1063,7 @@ def api_products_search_by_image():
             
             # Contar cuántas imágenes tienen embeddings CLIP
             total_con_embedding = imagenes_collection.count_documents({
-                'imagen_embedding_clip': {'$exists': True, '$ne': [], '$ne': None}
+                'imagen_embedding_clip': {'$exists': True, '$nin': [[], None]}
             })
             print(f"   📊 Imágenes con embedding CLIP en BD: {total_con_embedding}")
             
@@ -1002,8 +1095,8 @@ def api_products_search_by_image():
             else:
                 # Hay embeddings, hacer búsqueda manual
                 imagenes = list(imagenes_collection.find({
-                    'imagen_embedding_clip': {'$exists': True, '$ne': [], '$ne': None},
-                    'es_principal': True
+                    'imagen_embedding_clip': {'$exists': True, '$nin': [[], None]},
+                    'esPrincipal': True
                 }).limit(200))
                 
                 imagenes_con_similitud = []
@@ -1020,19 +1113,25 @@ def api_products_search_by_image():
                 
                 imagenes_con_similitud.sort(key=lambda x: x['similarity_score'], reverse=True)
                 
-                # Lookup manual de productos
+                # Lookup manual de productos: una sola consulta con $in para todo el top
                 productos_collection = db[COLLECTIONS['PRODUCTOS']]
+                top_imagenes = imagenes_con_similitud[:limit]
+                productos_por_id = {
+                    p['idProducto']: p
+                    for p in productos_collection.find(
+                        {'idProducto': {'$in': [img.get('idProducto') for img in top_imagenes]}},
+                        _SIN_EMBEDDINGS
+                    )
+                }
                 resultados = []
-                for img in imagenes_con_similitud[:limit]:
-                    producto = productos_collection.find_one({
-                        'codigo_producto': img['codigo_producto']
-                    })
+                for img in top_imagenes:
+                    producto = productos_por_id.get(img.get('idProducto'))
                     if producto:
                         resultados.append({
                             'producto_info': producto,
                             'similarity_score': img['similarity_score'],
-                            'texto_alternativo': img.get('texto_alternativo', ''),
-                            'url_imagen': img.get('url_imagen', '')
+                            'texto_alternativo': img.get('textoAlternativo', ''),
+                            'url_imagen': img.get('urlImagen', '')
                         })
                 
                 print(f"   ✓ Búsqueda manual encontró {len(resultados)} productos")
@@ -1090,7 +1189,7 @@ def api_products():
         db = get_database()
         productos_collection = db[COLLECTIONS['PRODUCTOS']]
         
-        productos = list(productos_collection.find({}).limit(50))
+        productos = list(productos_collection.find({}, _SIN_EMBEDDINGS).limit(50))
         
         # Convertir ObjectId a string
         for producto in productos:
@@ -1143,7 +1242,7 @@ def api_stats():
         
         stats = {}
         for collection_name in COLLECTIONS.values():
-            stats[collection_name] = db[collection_name].count_documents({})
+            stats[collection_name] = db[collection_name].estimated_document_count()
         
         return jsonify({
             "estadisticas": stats,
@@ -1157,6 +1256,99 @@ def api_stats():
         }), 500
 
 
+def run_rag(query, max_products=5, max_reviews=3, include_reviews=True, query_embedding=None):
+    """
+    Ejecuta el pipeline RAG completo (búsqueda + Groq) para una consulta.
+    
+    Args:
+        query: Consulta en lenguaje natural
+        max_products: Número máximo de productos a recuperar
+        max_reviews: Número máximo de reseñas a recuperar
+        include_reviews: Buscar también reseñas relevantes
+        query_embedding: Embedding ya calculado de la consulta (opcional)
+    
+    Returns:
+        dict: Respuesta con el formato del endpoint /rag
+    """
+    from search.vector_search import search_productos, search_resenas
+    
+    productos_finales = search_productos(
+        query=query,
+        limit=max_products,
+        min_score=0.3,
+        query_embedding=query_embedding
+    )
+    
+    resenas_encontradas = []
+    if include_reviews:
+        try:
+            resenas_encontradas = search_resenas(
+                query=query,
+                limit=max_reviews,
+                query_embedding=query_embedding
+            )
+        except Exception as e:
+            print(f"   ⚠️ Error buscando reseñas: {e}")
+            resenas_encontradas = []
+    
+    print(f"   ✅ Encontrados: {len(productos_finales)} productos, {len(resenas_encontradas)} reseñas")
+    
+    # ============================================================
+    # GENERAR RESPUESTA CON GROQ LLM
+    # ============================================================
+    
+    # Construir contexto para el LLM
+    contexto = f"CONSULTA: {query}\n\nPRODUCTOS ENCONTRADOS:\n\n"
+    
+    for i, producto in enumerate(productos_finales, 1):
+        contexto += f"{i}. {producto['nombre']}\n"
+        contexto += f"   Marca: {producto['marca']['nombre']}\n"
+        contexto += f"   Precio: ${producto['precioUsd']:.2f} USD\n"
+        contexto += f"   Descripción: {producto['descripcion'][:200]}...\n"
+        contexto += f"   Similitud: {producto['search_score']:.3f}\n\n"
+    
+    if resenas_encontradas:
+        contexto += "RESEÑAS RELEVANTES:\n\n"
+        for i, resena_data in enumerate(resenas_encontradas[:3], 1):
+            resena = resena_data['resena']  # Accedemos al objeto resena anidado
+            contexto += f"{i}. {resena['titulo']} ({resena['calificacion']}/5)\n"
+            contexto += f"   {resena['contenido'][:150]}...\n\n"
+    
+    # Generar respuesta con LLM
+    try:
+        print("   🧠 Generando respuesta con Groq LLM...")
+        respuesta = generate_answer_with_llm(contexto, query)
+        print(f"   ✓ Respuesta LLM generada: {len(respuesta)} caracteres")
+    except Exception as e:
+        print(f"   ❌ Error en LLM: {e}")
+        respuesta = f"**Resultados para '{query}':**\n\n"
+        for i, p in enumerate(productos_finales[:3], 1):
+            respuesta += f"{i}. **{p['nombre']}** - ${p['precioUsd']:.2f}\n"
+    
+    print(f"✅ RAG SIMPLE completado exitosamente")
+    
+    return {
+        'status': 'success',  # ¡Esto es clave para el frontend!
+        'query': query,
+        'rag_response': respuesta,
+        'contexto': contexto,
+        'productos': productos_finales,
+        'metadata': {
+            'total_productos': len(productos_finales),
+            'total_resenas': len(resenas_encontradas),
+            'model_used': 'search_products + Groq LLM',
+            'search_method': 'rag_simple_functional'
+        },
+        'context': {
+            'total_productos': len(productos_finales),
+            'total_resenas': len(resenas_encontradas),
+            'productos': productos_finales,
+            'resenas': resenas_encontradas
+        },
+        'sources': productos_finales  # También agregar sources
+    }
+
+
 @app.route('/rag', methods=['GET', 'POST'])
 def rag_query():
     if request.method == 'GET':
@@ -1187,91 +1379,91 @@ def rag_query():
         print(f"🤖 RAG SIMPLE: '{query}'")
         print(f"   📦 Max productos: {productos_label} | 💬 Max reseñas: {resenas_label} | 🖼️ Imágenes: {include_images}")
         
-        # ============================================================
-        # USAR LA FUNCIÓN QUE YA FUNCIONA
-        # ============================================================
-        
-        # ============================================================
-        # USAR LA FUNCIÓN search_productos QUE SÍ FUNCIONA
-        # ============================================================
-        from search.vector_search import search_productos, search_resenas
-        
-        productos_finales = search_productos(
-            query=query,
-            limit=max_products,
-            min_score=0.3
+        respuesta = run_rag(
+            query,
+            max_products=max_products,
+            max_reviews=max_reviews,
+            include_reviews=include_reviews
         )
+        return jsonify(respuesta)
         
-        resenas_encontradas = []
-        if include_reviews:
-            try:
-                resenas_encontradas = search_resenas(
-                    query=query,
-                    limit=max_reviews
-                )
-            except Exception as e:
-                print(f"   ⚠️ Error buscando reseñas: {e}")
-                resenas_encontradas = []
-        
-        print(f"   ✅ Encontrados: {len(productos_finales)} productos, {len(resenas_encontradas)} reseñas")
-        
-        # ============================================================
-        # GENERAR RESPUESTA CON GROQ LLM
-        # ============================================================
+    except Exception as e:
+        error_msg = f'Error en RAG: {str(e)}'
+        print(f"❌ {error_msg}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': error_msg, 'status': 'error'}), 500
+
+
+@app.route('/rag/batch', methods=['POST'])
+def rag_batch_query():
+    """
+    Ejecuta varias consultas RAG en una sola petición.
+    
+    Los embeddings de todas las consultas se calculan en un único lote y
+    las llamadas a Groq se lanzan en paralelo.
+    
+    Body JSON (como máximo RAG_BATCH_MAX_QUERIES consultas; max_products y
+    max_reviews se limitan a 1..RAG_BATCH_MAX_RESULTS):
+    {
+        "queries": ["consulta 1", "consulta 2"],
+        "max_products": 5,
+        "max_reviews": 3,
+        "include_reviews": true
+    }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        queries = data.get('queries', [])
+        if not isinstance(queries, list) or not all(isinstance(q, str) for q in queries):
+            return jsonify({'error': 'El parámetro queries debe ser una lista de textos', 'status': 'error'}), 400
+        if len(queries) > RAG_BATCH_MAX_QUERIES:
+            return jsonify({
+                'error': f'Máximo {RAG_BATCH_MAX_QUERIES} consultas por petición',
+                'status': 'error'
+            }), 400
+        queries = [q.strip() for q in queries if q.strip()]
+        try:
+            max_products = int(data.get('max_products', data.get('max_results', 5)) or 5)
+            max_reviews = int(data.get('max_reviews', 3) or 3)
+        except (TypeError, ValueError):
+            return jsonify({
+                'error': 'max_products y max_reviews deben ser números enteros',
+                'status': 'error'
+            }), 400
+        max_products = max(1, min(max_products, RAG_BATCH_MAX_RESULTS))
+        max_reviews = max(1, min(max_reviews, RAG_BATCH_MAX_RESULTS))
+        include_reviews = data.get('include_reviews', True)
         
-        # Construir contexto para el LLM
-        contexto = f"CONSULTA: {query}\n\nPRODUCTOS ENCONTRADOS:\n\n"
+        if not queries:
+            return jsonify({'error': 'El parámetro queries es requerido', 'status': 'error'}), 400
         
-        for i, producto in enumerate(productos_finales, 1):
-            contexto += f"{i}. {producto['nombre']}\n"
-            contexto += f"   Marca: {producto['marca']['nombre']}\n"
-            contexto += f"   Precio: ${producto['precioUsd']:.2f} USD\n"
-            contexto += f"   Descripción: {producto['descripcion'][:200]}...\n"
-            contexto += f"   Similitud: {producto['search_score']:.3f}\n\n"
+        print(f"🤖 RAG BATCH: {len(queries)} consultas")
         
-        if resenas_encontradas:
-            contexto += "RESEÑAS RELEVANTES:\n\n"
-            for i, resena_data in enumerate(resenas_encontradas[:3], 1):
-                resena = resena_data['resena']  # Accedemos al objeto resena anidado
-                contexto += f"{i}. {resena['titulo']} ({resena['calificacion']}/5)\n"
-                contexto += f"   {resena['contenido'][:150]}...\n\n"
+        from search.vector_search import generate_text_embeddings
+        embeddings = generate_text_embeddings(queries)
         
-        # Generar respuesta con LLM
-        try:
-            print("   🧠 Generando respuesta con Groq LLM...")
-            respuesta = generate_answer_with_llm(contexto, query)
-            print(f"   ✓ Respuesta LLM generada: {len(respuesta)} caracteres")
-        except Exception as e:
-            print(f"   ❌ Error en LLM: {e}")
-            respuesta = f"**Resultados para '{query}':**\n\n"
-            for i, p in enumerate(productos_finales[:3], 1):
-                respuesta += f"{i}. **{p['nombre']}** - ${p['precioUsd']:.2f}\n"
+        def ejecutar(args):
+            query, embedding = args
+            return run_rag(
+                query,
+                max_products=max_products,
+                max_reviews=max_reviews,
+                include_reviews=include_reviews,
+                query_embedding=embedding
+            )
         
-        print(f"✅ RAG SIMPLE completado exitosamente")
+        with ThreadPoolExecutor(max_workers=min(RAG_BATCH_WORKERS, len(queries))) as executor:
+            resultados = list(executor.map(ejecutar, zip(queries, embeddings)))
         
         return jsonify({
-            'status': 'success',  # ¡Esto es clave para el frontend!
-            'query': query,
-            'rag_response': respuesta,
-            'contexto': contexto,
-            'productos': productos_finales,
-            'metadata': {
-                'total_productos': len(productos_finales),
-                'total_resenas': len(resenas_encontradas),
-                'model_used': 'search_products + Groq LLM',
-                'search_method': 'rag_simple_functional'
-            },
-            'context': {
-                'total_productos': len(productos_finales),
-                'total_resenas': len(resenas_encontradas),
-                'productos': productos_finales,
-                'resenas': resenas_encontradas
-            },
-            'sources': productos_finales  # También agregar sources
+            'status': 'success',
+            'total': len(resultados),
+            'results': resultados
         })
         
     except Exception as e:
-        error_msg = f'Error en RAG: {str(e)}'
+        error_msg = f'Error en RAG batch: {str(e)}'
         print(f"❌ {error_msg}")
         import traceback
         traceback.print_exc()
@@ -1385,9 +1577,9 @@ def api_show_results_util():
             {
                 '$vectorSearch': {
                     'index': 'idx_descripcion_vector',
-                    'path': 'descripcion_embedding',
+                    'path': 'descripcionEmbedding',
                     'queryVector': query_embedding,
-                    'numCandidates': limit * 10,
+                    'numCandidates': num_candidates_for(limit),
                     'limit': limit
                 }
             },
@@ -1395,6 +1587,10 @@ def api_show_results_util():
                 '$addFields': {
                     'score': {'$meta': 'vectorSearchScore'}
                 }
+            },
+            {
+                # No devolver los vectores: show_results solo usa metadatos
+                '$project': _SIN_EMBEDDINGS
             }
         ]))
         